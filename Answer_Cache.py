@@ -0,0 +1,156 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+from Vector_Store import LocalVectorStore
+from Hot_Tier import notes_hot_tier
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "0") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))  # seconds
+# Answers that used no retrieved context may be served to every user
+ANSWER_CACHE_SHARED = os.getenv("ANSWER_CACHE_SHARED", "0") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))  # per user (and shared)
+
+# ---------------- SEMANTIC ANSWER CACHE ----------------
+_SHARED = "__shared__"
+
+class SemanticAnswerCache:
+    """
+    Returns a stored answer when a new question is nearly the same as an
+    earlier one.
+
+    Question embeddings are kept in an in-process LocalVectorStore, one
+    namespace per user plus a shared one. This is deliberately separate from
+    the chat_history vectors that get_conversation_context searches: those
+    embed the whole "Q: ... A: ..." text, which a bare question rarely
+    matches at answer-cache thresholds, and they carry no notes version to
+    tell whether an answer predates the user's latest upload (kb_version
+    is only meaningful within one process). The cache therefore starts
+    empty on restart and is not shared between server processes.
+
+    A lookup is a hit when the closest cached question scores at least
+    `threshold`, is younger than `ttl` and, for per-user entries, was
+    answered against the user's current notes (the hot tier's
+    knowledge-base version). Shared entries are only written
+    for answers that used no retrieved context at all (notes, earlier
+    conversations or anything else the user's tools returned).
+    """
+
+    def __init__(self, enabled: bool = ANSWER_CACHE_ENABLED, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: float = ANSWER_CACHE_TTL, shared: bool = ANSWER_CACHE_SHARED,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.shared = shared
+        self.max_entries = max(1, max_entries)
+        self._store = LocalVectorStore(path="")
+        self._lock = threading.Lock()
+        self._order: Dict[str, "OrderedDict[str, float]"] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    def _match(self, namespace: str, vector: Sequence[float], kb_version: Optional[int]) -> Optional[Dict[str, Any]]:
+        result = self._store.query(vector, top_k=1, namespace=namespace)
+        if not result.matches:
+            return None
+        match = result.matches[0]
+        if match.score < self.threshold:
+            return None
+        meta = match.metadata or {}
+        if time.time() - meta.get("created_at", 0) > self.ttl:
+            self.expired += 1
+        elif kb_version is not None and meta.get("kb_version") != kb_version:
+            # The user's notes changed since this answer was given
+            self.invalidated += 1
+        else:
+            return {"question": meta.get("question", ""), "answer": meta.get("answer", ""),
+                    "contexts": meta.get("contexts", []), "score": match.score}
+        self._store.delete(ids=[match.id], namespace=namespace)
+        self._order.get(namespace, {}).pop(match.id, None)
+        return None
+
+    def lookup(self, user_id: str, vector: Sequence[float], kb_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cached {"question", "answer", "contexts", "score"} for a near-duplicate
+        question, or None. `kb_version` defaults to the user's current one.
+        """
+        if not self.enabled or not user_id:
+            return None
+        if kb_version is None:
+            kb_version = notes_hot_tier.kb_version(user_id)
+        with self._lock:
+            self.lookups += 1
+            hit = self._match(user_id, vector, kb_version)
+            if hit is None and self.shared:
+                hit = self._match(_SHARED, vector, None)
+                if hit is not None:
+                    self.shared_hits += 1
+            if hit is not None:
+                self.hits += 1
+        return hit
+
+    def put(self, user_id: str, question: str, vector: Sequence[float], answer: str,
+            contexts: Optional[List[Dict[str, Any]]] = None, kb_version: Optional[int] = None):
+        """
+        Cache an answer; it is also shared when enabled and no context was used.
+
+        Pass the `kb_version` read before the answer was generated: a note
+        write that lands while the answer streams must make the entry stale.
+        """
+        if not self.enabled or not user_id or not answer:
+            return
+        contexts = contexts or []
+        if kb_version is None:
+            kb_version = notes_hot_tier.kb_version(user_id)
+        key = hashlib.sha256(" ".join(question.lower().split()).encode("utf-8")).hexdigest()[:16]
+        namespaces = [user_id]
+        if self.shared and not contexts:
+            namespaces.append(_SHARED)
+        with self._lock:
+            for namespace in namespaces:
+                self._store.upsert([{
+                    "id": key,
+                    "values": list(vector),
+                    "metadata": {
+                        "question": question,
+                        "answer": answer,
+                        "contexts": contexts,
+                        "created_at": time.time(),
+                        "kb_version": kb_version if namespace != _SHARED else None
+                    }
+                }], namespace=namespace)
+                order = self._order.setdefault(namespace, OrderedDict())
+                order[key] = time.time()
+                order.move_to_end(key)
+                while len(order) > self.max_entries:
+                    oldest, _ = order.popitem(last=False)
+                    self._store.delete(ids=[oldest], namespace=namespace)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._order.pop(user_id, None)
+            self._store.delete(delete_all=True, namespace=user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "expired": self.expired,
+                "invalidated": self.invalidated,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "entries": sum(len(order) for order in self._order.values())
+            }
+
+answer_cache = SemanticAnswerCache()
@@ -10,7 +10,6 @@ from typing import List, Dict, Any, Generator
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
-from pinecone import Pinecone, ServerlessSpec
 import fitz  # PyMuPDF
 import docx2txt
 from langgraph.graph import StateGraph, END
@@ -27,6 +26,14 @@ import wikipedia
 import requests
 import bcrypt
 import jwt
+from Embeddings import embed_text, embed_texts, to_pinecone
+from Upsert_Engine import write_records
+from Write_Ahead_Log import DurableQueue
+from Vector_Store import get_vector_store, record_namespace, user_namespace
+from Hot_Tier import notes_hot_tier
+from Keyword_Index import keyword_index, reciprocal_rank_fusion, KEYWORD_MIN_COVERAGE
+from Answer_Cache import answer_cache
+from Retrieval_Cache import retrieval_cache, normalize_query
 
 # ---------------- TIMEZONE SUPPORT ----------------
 try:
@@ -60,89 +67,17 @@ def format_timestamp_to_local(timestamp, timezone_str=None, format_str="%Y-%m-%d
 # ---------------- LOAD ENV VARIABLES ----------------
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = os.getenv("INDEX_NAME", "studybuddy")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
-PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT", "us-east-1")
 DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key")
 
 if not GEMINI_API_KEY:
     raise ValueError("❌ GEMINI_API_KEY not found!")
-if not PINECONE_API_KEY:
-    raise ValueError("❌ PINECONE_API_KEY not found!")
 
-# ---------------- CONFIGURE GEMINI & PINECONE ----------------
+# ---------------- CONFIGURE GEMINI & VECTOR STORE ----------------
 client = genai.Client(api_key=GEMINI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-existing_indexes = [i.name for i in pc.list_indexes()]
-if INDEX_NAME not in existing_indexes:
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=768,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region=PINECONE_ENVIRONMENT)
-    )
-index = pc.Index(INDEX_NAME)
-
-# ============================================
-# EMBEDDING FUNCTION
-# ============================================
-
-def embed_text(text: str):
-    try:
-        if not text or not text.strip():
-            print("[WARNING] Empty text provided for embedding")
-            hash_val = int(hashlib.md5(str(time.time()).encode()).hexdigest()[:8], 16)
-            random.seed(hash_val)
-            return [random.uniform(0.01, 0.02) for _ in range(768)]
-        
-        text = text.strip()
-        if len(text) > 10000:
-            text = text[:10000]
-        
-        result = client.models.embed_content(
-            model="gemini-embedding-2",
-            contents=[text],
-            config=types.EmbedContentConfig(output_dimensionality=768)
-        )
-        
-        emb = None
-        if result and result.embeddings and len(result.embeddings) > 0:
-            if hasattr(result.embeddings[0], 'values'):
-                emb = result.embeddings[0].values
-            elif isinstance(result.embeddings[0], list):
-                emb = result.embeddings[0]
-            else:
-                emb = list(result.embeddings[0])
-        
-        if emb is None:
-            hash_val = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
-            random.seed(hash_val)
-            return [random.uniform(0.01, 0.02) for _ in range(768)]
-        
-        if len(emb) != 768:
-            if len(emb) < 768:
-                emb = emb + [random.uniform(0.001, 0.002) for _ in range(768 - len(emb))]
-            else:
-                emb = emb[:768]
-        
-        norm = sum(v**2 for v in emb) ** 0.5
-        if norm > 0:
-            emb = [v / norm for v in emb]
-        
-        return emb
-        
-    except Exception as e:
-        print(f"[ERROR] embed_text: {e}")
-        if text:
-            hash_val = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
-            random.seed(hash_val)
-        else:
-            random.seed(int(time.time()))
-        return [random.uniform(0.01, 0.02) for _ in range(768)]
+index = get_vector_store()
 
 # ============================================
 # PINECONE CRUD OPERATIONS (All in One)
@@ -185,7 +120,7 @@ def store_user(email: str, password: str) -> dict:
     index.upsert(
         vectors=[{
             "id": f"{user_id}_auth",
-            "values": embedding,
+            "values": to_pinecone(embedding),
             "metadata": {
                 "user_id": user_id,
                 "type": "user_auth",
@@ -209,7 +144,7 @@ def find_user_by_email(email: str) -> dict:
     
     try:
         results = index.query(
-            vector=embedding,
+            vector=to_pinecone(embedding),
             top_k=1,
             include_metadata=True,
             namespace="users",
@@ -238,26 +173,38 @@ def verify_user(email: str, password: str) -> dict:
         return user
     return None
 
+# Per-user count of stored chat batches; part of the retrieval cache key
+# when prior Q/A is requested
+_chat_versions = {}
+
+def _write_conversations(records: list):
+    """Embed a batch of queued Q/A records in one call and upsert them"""
+    # strict: a Gemini outage leaves the batch in the WAL instead of storing placeholders
+    write_records(index, records, lambda texts: embed_texts(texts, strict=True),
+                  namespace=record_namespace)
+    for user_id in {record["metadata"]["user_id"] for record in records}:
+        _chat_versions[user_id] = _chat_versions.get(user_id, 0) + 1
+
+# Logged to the WAL, then embedded and upserted in the background
+conversation_queue = DurableQueue("conversation", _write_conversations)
+
 def store_conversation(user_id: str, question: str, answer: str, contexts: list):
-    """Store conversation in Pinecone"""
-    text = f"Q: {question}\nA: {answer}"
-    embedding = embed_text(text)
-    
-    index.upsert(
-        vectors=[{
-            "id": f"{user_id}_{int(time.time())}",
-            "values": embedding,
-            "metadata": {
-                "user_id": user_id,
-                "type": "chat_history",
-                "question": question,
-                "answer": answer,
-                "contexts": json.dumps(contexts),
-                "timestamp": datetime.now().isoformat()
-            }
-        }],
-        namespace="chat_history"
-    )
+    """Queue a conversation for Pinecone; it is embedded and upserted in the background"""
+    # Same user + same Q/A always maps to the same vector, so a turn saved
+    # twice (or replayed from the WAL) is written once
+    content_hash = hashlib.sha256(f"{question}\n{answer}".encode("utf-8")).hexdigest()
+    conversation_queue.put({
+        "id": f"{user_id}_chat_{content_hash[:16]}",
+        "text": f"Q: {question}\nA: {answer}",
+        "metadata": {
+            "user_id": user_id,
+            "type": "chat_history",
+            "question": question,
+            "answer": answer,
+            "contexts": json.dumps(contexts),
+            "timestamp": datetime.now().isoformat()
+        }
+    })
     return True
 
 def get_user_history(user_id: str, limit: int = 50) -> list:
@@ -268,7 +215,7 @@ def get_user_history(user_id: str, limit: int = 50) -> list:
         vector=dummy_vector,
         top_k=limit,
         include_metadata=True,
-        namespace="chat_history",
+        namespace=user_namespace(user_id),
         filter={
             "user_id": {"$eq": user_id},
             "type": {"$eq": "chat_history"}
@@ -287,15 +234,15 @@ def get_user_history(user_id: str, limit: int = 50) -> list:
     
     return history
 
-def get_conversation_context(user_id: str, query: str, top_k: int = 3) -> list:
+def get_conversation_context(user_id: str, query: str, top_k: int = 3, memo: dict = None) -> list:
     """Get relevant context for user's query"""
-    embedding = embed_text(query)
+    embedding = embed_text(query, memo=memo)
     
     results = index.query(
-        vector=embedding,
+        vector=to_pinecone(embedding),
         top_k=top_k,
         include_metadata=True,
-        namespace="chat_history",
+        namespace=user_namespace(user_id),
         filter={
             "user_id": {"$eq": user_id},
             "type": {"$eq": "chat_history"}
@@ -329,67 +276,142 @@ def set_last_contexts(contexts):
 # RAG CONTEXT RETRIEVAL (Updated with user_id)
 # ============================================
 
-def retrieve_context(query: str, user_id: str = None, top_k: int = 5) -> tuple:
+# How many contexts of each metadata type retrieve_context returns, in
+# this order. Quiz and progress vectors carry no text, so they are never
+# worth a slot.
+DEFAULT_CONTEXT_QUOTAS = {"notes": 3}
+
+def _context_text(meta: dict) -> str:
+    if meta.get("type") == "chat_history":
+        question, answer = meta.get("question", ""), meta.get("answer", "")
+        return f"Q: {question}\nA: {answer}" if question and answer else ""
+    return meta.get("text", "")
+
+def _retrieve_type(q_emb, query: str, user_id: str, doc_type: str, top_k: int) -> tuple:
+    """
+    Ranked contexts of one type; notes also get BM25 hits fused in.
+    
+    Returns (contexts, complete). `complete` is False when a search was
+    skipped or failed (no query embedding, vector or keyword search error,
+    keyword backfill still running, or no vector matches), so the result is
+    usable but should not be cached.
+    """
+    filter_dict = {"type": {"$eq": doc_type}}
+    if user_id:
+        filter_dict["user_id"] = {"$eq": user_id}
+    
+    complete = q_emb is not None
+    matches = []
+    if q_emb is not None:
+        try:
+            resp = None
+            if doc_type == "notes":
+                # Loaded users are answered from the in-memory copy of their notes
+                resp = notes_hot_tier.query(user_id, q_emb, top_k=top_k, filter=filter_dict) if user_id else None
+            if resp is None:
+                query_args = {"namespace": user_namespace(user_id)} if user_id else {}
+                resp = index.query(
+                    vector=q_emb, 
+                    filter=filter_dict,
+                    top_k=top_k, 
+                    include_metadata=True,
+                    include_values=False,
+                    **query_args
+                )
+            matches = getattr(resp, "matches", None) or []
+        except Exception as e:
+            print(f"[WARNING] Vector search failed ({doc_type}): {e}")
+            complete = False
+        if not matches:
+            complete = False
+    
+    # Exact terms (formula names, acronyms, course codes) that the
+    # embedding blurs are caught by BM25 over the same chunks
+    keyword_matches = []
+    if user_id and doc_type == "notes":
+        try:
+            keyword_matches = keyword_index.search(user_id, query, top_k=top_k)
+        except Exception as e:
+            print(f"[WARNING] Keyword search failed: {e}")
+            complete = False
+        if keyword_index.backfilling(user_id):
+            complete = False
+    # Keyword-only hits skip the vector floor only when they contain most of
+    # the query's terms; a chunk sharing one common word is not a match
+    keyword_ids = {match.id for match in keyword_matches
+                   if match.metadata["term_coverage"] >= KEYWORD_MIN_COVERAGE}
+    print(f"  [DEBUG] Found {len(matches)} vector + {len(keyword_matches)} keyword {doc_type} matches for: {query[:30]}...")
+    
+    contexts = []
+    seen_texts = set()
+    for entry in reciprocal_rank_fusion(matches, keyword_matches):
+        meta = entry["metadata"]
+        text = _context_text(meta)
+        vector_score = entry["vector_score"] or 0
+        
+        if text and (entry["id"] in keyword_ids or vector_score > 0.1) and text not in seen_texts:
+            seen_texts.add(text)
+            if len(text) > 800:
+                text = text[:800] + "..."
+            contexts.append({
+                "text": text,
+                "source": meta.get("type", meta.get("source", "unknown")),
+                "score": entry["score"],
+                "vector_score": entry["vector_score"]
+            })
+    return contexts, complete
+
+def retrieve_context(query: str, user_id: str = None, top_k: int = 5, memo: dict = None,
+                     quotas: dict = None) -> tuple:
+    """
+    Retrieve context for `query` from the user's knowledge base.
+    
+    `quotas` maps metadata types to how many contexts of that type to
+    return (default DEFAULT_CONTEXT_QUOTAS: three note chunks); e.g.
+    {"notes": 3, "chat_history": 1} adds the closest earlier Q/A. Each type
+    is queried with its own type filter, `top_k` candidates each, so every
+    slot holds usable text.
+    """
     try:
-        q_emb = embed_text(query)
+        quotas = quotas or DEFAULT_CONTEXT_QUOTAS
         
-        filter_dict = {}
+        # Repeat lookups skip the embedding and both searches. The key carries
+        # the knowledge-base version, which every note write in this process
+        # bumps; the cache's TTL bounds anything the version misses
+        cache_key = None
         if user_id:
-            filter_dict["user_id"] = {"$eq": user_id}
-        
-        if filter_dict:
-            resp = index.query(
-                vector=q_emb, 
-                filter=filter_dict,
-                top_k=top_k, 
-                include_metadata=True,
-                include_values=False
-            )
-        else:
-            resp = index.query(
-                vector=q_emb, 
-                top_k=top_k, 
-                include_metadata=True,
-                include_values=False
-            )
-        
-        matches = getattr(resp, "matches", [])
-        print(f"  [DEBUG] Found {len(matches)} matches for: {query[:30]}...")
-        
-        if not matches:
-            return "No relevant information found.", []
-        
-        contexts = []
-        seen_texts = set()
-        
-        for match in matches:
-            meta = match.metadata or {}
-            text = meta.get("text", "")
-            score = match.score or 0
-            source = meta.get("type", meta.get("source", "unknown"))
-            
-            if text and score > 0.1 and text not in seen_texts:
-                seen_texts.add(text)
-                source_type = meta.get("type", meta.get("source", "unknown"))
-                
-                if len(text) > 800:
-                    text = text[:800] + "..."
-                
-                contexts.append({
-                    "text": text,
-                    "source": source_type,
-                    "score": score
-                })
-        
-        contexts.sort(key=lambda x: x.get("score", 0), reverse=True)
-        top_contexts = contexts[:3]
-        
+            cache_key = (normalize_query(query), top_k, tuple(quotas.items()),
+                         notes_hot_tier.kb_version(user_id),
+                         _chat_versions.get(user_id, 0) if "chat_history" in quotas else None)
+            cached = retrieval_cache.get(user_id, cache_key)
+            if cached is not None:
+                result, contexts = cached
+                return result, [dict(c) for c in contexts]
+        
+        # strict: a placeholder vector would return (and cache) unrelated chunks
+        try:
+            q_emb = to_pinecone(embed_text(query, memo=memo, strict=True))
+        except Exception as e:
+            print(f"[WARNING] Query embedding failed, keyword search only: {e}")
+            q_emb = None
+        
+        top_contexts = []
+        complete = True
+        for doc_type, quota in quotas.items():
+            if quota > 0:
+                contexts, type_complete = _retrieve_type(q_emb, query, user_id, doc_type, max(top_k, quota))
+                complete = complete and type_complete
+                top_contexts.extend(contexts[:quota])
+        
+        result = "No relevant information found."
         if top_contexts:
             context_strings = [f"[From {c['source']}] {c['text']}" for c in top_contexts]
             result = "\n\n---\n\n".join(context_strings)
-            return result, top_contexts
         
-        return "No relevant information found.", []
+        # Degraded results are returned but recomputed next time
+        if cache_key is not None and complete:
+            retrieval_cache.put(user_id, cache_key, (result, [dict(c) for c in top_contexts]))
+        return result, top_contexts
         
     except Exception as e:
         print(f"[ERROR] retrieve_context: {e}")
@@ -442,9 +464,60 @@ def web_search(query: str) -> str:
 # MAIN CHATBOT FUNCTION (Pinecone Only)
 # ============================================
 
+def _save_turn(user_id: str, user_input: str, answer: str, q_emb=None, kb_version=None):
+    contexts_used = get_last_contexts()
+    context_texts = [c.get('text', '') for c in contexts_used if c.get('text')]
+    
+    try:
+        # Queued for Pinecone; written by the background flusher
+        store_conversation(
+            user_id=user_id or "default_user",
+            question=user_input,
+            answer=answer,
+            contexts=context_texts
+        )
+        print(f"\n📊 Queued for Pinecone")
+        
+    except Exception as e:
+        print(f"⚠️ Pinecone save error: {e}")
+    
+    if q_emb is not None:
+        answer_cache.put(user_id, user_input, q_emb, answer, contexts_used, kb_version=kb_version)
+
 def get_gemini_response(user_input: str, history: list = None, user_id: str = None) -> Generator[str, None, None]:
     """StudyBuddy with Pinecone-only architecture."""
     try:
+        # Query embeddings computed during this turn, shared by every retrieval
+        turn_embeddings = {}
+        set_last_contexts([])
+        
+        # The app passes the session's messages including this question;
+        # keep only the turns before it
+        history = list(history or [])
+        if history and history[-1].get('role') == 'user' and history[-1].get('message') == user_input:
+            history = history[:-1]
+        
+        # Opt-in: a near-duplicate of an earlier question is answered from the
+        # cache. Follow-ups depend on the conversation so far, so a turn with
+        # history is neither looked up nor stored
+        q_emb = None
+        kb_version = None
+        if answer_cache.enabled and user_id and user_input and not history:
+            # Read before answering; the cached answer reflects the notes as of now
+            kb_version = notes_hot_tier.kb_version(user_id)
+            try:
+                q_emb = to_pinecone(embed_text(user_input, memo=turn_embeddings, strict=True))
+            except Exception as e:
+                print(f"[WARNING] Answer cache skipped, embedding failed: {e}")
+        if q_emb is not None:
+            cached = answer_cache.lookup(user_id, q_emb, kb_version=kb_version)
+            if cached is not None:
+                print(f"[INFO] Answer cache hit ({cached['score']:.3f}): {cached['question'][:40]}")
+                set_last_contexts(cached["contexts"])
+                yield cached["answer"]
+                _save_turn(user_id, user_input, cached["answer"])
+                return
+        
         system_prompt = """You are StudyBuddy 🤖, a smart research assistant and tutor.
 
 Guidelines:
@@ -454,6 +527,7 @@ Guidelines:
 
 Available tools:
 - search_notes: Search the user's personal notes/documents
+- search_past_conversations: Search the user's earlier questions and your answers to them
 - search_wikipedia: Search Wikipedia for encyclopedia knowledge
 - web_search: Search the web for current news and real-time information"""
 
@@ -467,15 +541,28 @@ Available tools:
         def search_notes(query: str) -> str:
             """Search the user's personal notes and documents."""
             try:
-                context_str, contexts = retrieve_context(query, user_id, top_k=5)
-                set_last_contexts(contexts)
+                context_str, contexts = retrieve_context(query, user_id, top_k=5, memo=turn_embeddings)
+                set_last_contexts(get_last_contexts() + contexts)
                 if context_str and "No relevant" not in context_str:
                     return f"📄 From your notes:\n\n{context_str}"
                 return "No relevant information found in your notes."
             except Exception as e:
                 return f"Error searching notes: {str(e)}"
 
-        tools = [search_notes, search_wikipedia, web_search]
+        @tool
+        def search_past_conversations(query: str) -> str:
+            """Search the user's earlier questions and StudyBuddy's answers to them."""
+            try:
+                context_str, contexts = retrieve_context(query, user_id, top_k=5, memo=turn_embeddings,
+                                                         quotas={"chat_history": 2})
+                set_last_contexts(get_last_contexts() + contexts)
+                if context_str and "No relevant" not in context_str:
+                    return f"💬 From your past conversations:\n\n{context_str}"
+                return "No relevant earlier conversations found."
+            except Exception as e:
+                return f"Error searching past conversations: {str(e)}"
+
+        tools = [search_notes, search_past_conversations, search_wikipedia, web_search]
 
         agent = create_agent(
             model=llm,
@@ -526,7 +613,7 @@ Available tools:
             print(f"[WARNING] Agent streaming failed: {stream_error}")
             print("[INFO] Falling back to direct response...")
             
-            context_str, contexts = retrieve_context(user_input, user_id, top_k=3)
+            context_str, contexts = retrieve_context(user_input, user_id, top_k=3, memo=turn_embeddings)
             set_last_contexts(contexts)
             
             fallback_llm = ChatGroq(
@@ -549,21 +636,7 @@ User question: {user_input}"""
         # SAVE TO PINECONE (No Vercel, No MongoDB)
         # ============================================
         if collected_response and user_input:
-            contexts_used = get_last_contexts()
-            context_texts = [c.get('text', '') for c in contexts_used if c.get('text')]
-            
-            try:
-                # Store in Pinecone
-                store_conversation(
-                    user_id=user_id or "default_user",
-                    question=user_input,
-                    answer=collected_response,
-                    contexts=context_texts
-                )
-                print(f"\n📊 Saved to Pinecone")
-                
-            except Exception as e:
-                print(f"⚠️ Pinecone save error: {e}")
+            _save_turn(user_id, user_input, collected_response, q_emb, kb_version)
 
     except Exception as e:
         print(f"[ERROR] get_gemini_response: {e}")
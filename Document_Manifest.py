@@ -0,0 +1,148 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Iterable, List, Dict, Optional, Set
+from dotenv import load_dotenv
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(".studybuddy", "manifests.sqlite3"))
+
+# ---------------- DOCUMENT MANIFEST ----------------
+class DocumentManifest:
+    """
+    Per-document record of which chunk content hashes are in the vector store.
+
+    Re-ingesting a document compares its chunk hashes against this manifest so
+    only new or changed chunks are embedded and chunks that disappeared can be
+    deleted from Pinecone.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " user_id TEXT NOT NULL,"
+                " doc_id TEXT NOT NULL,"
+                " name TEXT,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (user_id, doc_id))"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            if "source_hash" not in columns:
+                self._conn.execute("ALTER TABLE documents ADD COLUMN source_hash TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_source ON documents(user_id, source_hash)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " user_id TEXT NOT NULL,"
+                " doc_id TEXT NOT NULL,"
+                " chunk_hash TEXT NOT NULL,"
+                " PRIMARY KEY (user_id, doc_id, chunk_hash))"
+            )
+            self._conn.commit()
+        except Exception as e:
+            # Without a manifest every upload is treated as a new document
+            print(f"[WARNING] Document manifest disabled ({path}): {e}")
+            self._conn = None
+
+    def get_chunks(self, user_id: str, doc_id: str) -> Set[str]:
+        if self._conn is None:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_hash FROM chunks WHERE user_id = ? AND doc_id = ?", (user_id, doc_id)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_chunks(self, user_id: str, doc_id: str, chunk_hashes: Iterable[str], name: str = None):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (user_id, doc_id, chunk_hash) VALUES (?, ?, ?)",
+                [(user_id, doc_id, h) for h in chunk_hashes]
+            )
+            self._touch(user_id, doc_id, name)
+            self._conn.commit()
+
+    def remove_chunks(self, user_id: str, doc_id: str, chunk_hashes: Iterable[str]):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE user_id = ? AND doc_id = ? AND chunk_hash = ?",
+                [(user_id, doc_id, h) for h in chunk_hashes]
+            )
+            self._touch(user_id, doc_id, None)
+            self._conn.commit()
+
+    def remove_user(self, user_id: str):
+        """Forget every document of a user (after their vectors were deleted)."""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM documents WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    def set_source_hash(self, user_id: str, doc_id: str, source_hash: str):
+        """Record the sha256 of the file bytes a document was last ingested from."""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._touch(user_id, doc_id, None)
+            self._conn.execute(
+                "UPDATE documents SET source_hash = ? WHERE user_id = ? AND doc_id = ?",
+                (source_hash, user_id, doc_id)
+            )
+            self._conn.commit()
+
+    def find_source(self, user_id: str, source_hash: str) -> Optional[Dict]:
+        """Return the document already ingested from exactly these bytes, if any."""
+        if self._conn is None or not source_hash:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id, name, updated_at FROM documents WHERE user_id = ? AND source_hash = ?",
+                (user_id, source_hash)
+            ).fetchone()
+        if not row:
+            return None
+        return {"doc_id": row[0], "name": row[1], "updated_at": row[2]}
+
+    def list_documents(self, user_id: str) -> List[Dict]:
+        if self._conn is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.doc_id, d.name, d.updated_at, COUNT(c.chunk_hash)"
+                " FROM documents d LEFT JOIN chunks c"
+                " ON c.user_id = d.user_id AND c.doc_id = d.doc_id"
+                " WHERE d.user_id = ? GROUP BY d.doc_id ORDER BY d.updated_at DESC",
+                (user_id,)
+            ).fetchall()
+        return [
+            {"doc_id": doc_id, "name": name, "updated_at": updated_at, "chunk_count": count}
+            for doc_id, name, updated_at, count in rows
+        ]
+
+    def _touch(self, user_id: str, doc_id: str, name: str = None):
+        self._conn.execute(
+            "INSERT INTO documents (user_id, doc_id, name, updated_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(user_id, doc_id) DO UPDATE SET"
+            " name = COALESCE(excluded.name, documents.name), updated_at = excluded.updated_at",
+            (user_id, doc_id, name, time.time())
+        )
+
+document_manifest = DocumentManifest()
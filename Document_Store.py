@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional
+from dotenv import load_dotenv
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", os.path.join(".studybuddy", "documents.sqlite3"))
+
+# ---------------- LOCAL DOCUMENT STORE ----------------
+class DocumentStore:
+    """
+    Local home for bulky JSON payloads (full quizzes, per-question feedback).
+
+    Payloads are stored zlib-compressed in SQLite under the ID of the vector
+    that describes them. Pinecone keeps only that ID plus small filterable
+    fields, and callers load payloads lazily for the rows they display.
+    """
+
+    def __init__(self, path: str = DOCUMENT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS payloads ("
+                " key TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " payload BLOB NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_payloads_user ON payloads(user_id, kind)")
+            self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Document store disabled ({path}): {e}")
+            self._conn = None
+
+    def put(self, key: str, user_id: str, kind: str, payload: Dict[str, Any]) -> bool:
+        if self._conn is None:
+            return False
+        blob = zlib.compress(json.dumps(payload).encode("utf-8"), 6)
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO payloads (key, user_id, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, user_id, kind, blob, time.time())
+                )
+                self._conn.commit()
+            return True
+        except Exception as e:
+            print(f"[WARNING] Document store write failed: {e}")
+            return False
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return {key: payload} for the keys that exist."""
+        keys = [k for k in dict.fromkeys(keys) if k]
+        found = {}
+        if self._conn is None or not keys:
+            return found
+        try:
+            with self._lock:
+                for i in range(0, len(keys), 500):
+                    batch = keys[i:i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, payload FROM payloads WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = json.loads(zlib.decompress(blob).decode("utf-8"))
+        except Exception as e:
+            print(f"[WARNING] Document store read failed: {e}")
+        return found
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([key]).get(key)
+
+    def delete_many(self, keys: Iterable[str]):
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.executemany("DELETE FROM payloads WHERE key = ?", [(k,) for k in keys])
+                self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Document store delete failed: {e}")
+
+    def delete_user(self, user_id: str):
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM payloads WHERE user_id = ?", (user_id,))
+                self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Document store delete failed: {e}")
+
+document_store = DocumentStore()
@@ -0,0 +1,137 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Optional
+from dotenv import load_dotenv
+import numpy as np
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(".studybuddy", "embedding_cache.sqlite3"))
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "50000"))
+
+# ---------------- PERSISTENT EMBEDDING CACHE ----------------
+class EmbeddingCache:
+    """
+    On-disk, content-addressed cache of raw embedding vectors.
+
+    Entries are keyed by (model, dimensionality, sha256(text)) and stored as
+    float32 blobs in SQLite. Every hit refreshes `last_used`, and once
+    the table grows past `max_entries` the least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Embedding cache disabled ({path}): {e}")
+            self._conn = None
+
+    @staticmethod
+    def make_key(model: str, dimensionality: int, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{dimensionality}:{digest}"
+
+    def get_many(self, model: str, dimensionality: int, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Return {text: vector} for every text already in the cache."""
+        if not texts:
+            return {}
+        keys = {self.make_key(model, dimensionality, t): t for t in set(texts)}
+        found = {}
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    key_list = list(keys)
+                    for i in range(0, len(key_list), 500):
+                        batch = key_list[i:i + 500]
+                        placeholders = ",".join("?" * len(batch))
+                        rows = self._conn.execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                        ).fetchall()
+                        for key, blob in rows:
+                            found[keys[key]] = np.frombuffer(blob, dtype=np.float32).copy()
+                    if found:
+                        now = time.time()
+                        self._conn.executemany(
+                            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                            [(now, self.make_key(model, dimensionality, t)) for t in found]
+                        )
+                        self._conn.commit()
+            except Exception as e:
+                print(f"[WARNING] Embedding cache read failed: {e}")
+
+        hit_count = sum(1 for t in texts if t in found)
+        self.hits += hit_count
+        self.misses += len(texts) - hit_count
+        return found
+
+    def get(self, model: str, dimensionality: int, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model, dimensionality, [text]).get(text)
+
+    def put_many(self, model: str, dimensionality: int, items: Dict[str, np.ndarray]):
+        """Store {text: vector} pairs and evict LRU rows beyond max_entries."""
+        if not items or self._conn is None:
+            return
+        now = time.time()
+        rows = [
+            (self.make_key(model, dimensionality, text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in items.items()
+        ]
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+                )
+                count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN ("
+                        " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+                self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Embedding cache write failed: {e}")
+
+    def put(self, model: str, dimensionality: int, text: str, vector: np.ndarray):
+        self.put_many(model, dimensionality, {text: vector})
+
+    def stats(self) -> Dict[str, float]:
+        entries = 0
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except Exception:
+                pass
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries
+        }
+
+# Shared by every caller of Embeddings
+embedding_cache = EmbeddingCache()
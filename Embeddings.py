@@ -0,0 +1,293 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Sequence, Set, Union
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+import numpy as np
+from Embedding_Cache import embedding_cache
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+EMBED_MODEL = os.getenv("EMBED_MODEL", "gemini-embedding-2")
+EMBED_DIM = 768
+MAX_EMBED_CHARS = 10000
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "100"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "1.0"))
+EMBED_BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "30.0"))
+
+# ---------------- CONFIGURE GEMINI ----------------
+# Progress only needs placeholder vectors, so a missing key is reported at
+# embedding time instead of on import.
+client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
+
+# ---------------- VECTOR POLICY ----------------
+# Every vector handed out by this module is a contiguous float32 array of
+# length EMBED_DIM with unit L2 norm. Lists only appear at the Pinecone
+# boundary (to_pinecone).
+
+def fit_dimension(matrix: np.ndarray, dim: int = EMBED_DIM) -> np.ndarray:
+    """Zero-pad or truncate the last axis of `matrix` to `dim`."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    width = matrix.shape[-1]
+    if width > dim:
+        matrix = matrix[..., :dim]
+    elif width < dim:
+        pad = [(0, 0)] * (matrix.ndim - 1) + [(0, dim - width)]
+        matrix = np.pad(matrix, pad)
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector or each row of a matrix; zero rows stay zero."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def placeholder_vector(text: str) -> np.ndarray:
+    """
+    Deterministic, network-free vector derived from sha256(text).
+
+    Used for empty input, failed embedding calls and records that are only
+    ever looked up by metadata filter.
+    """
+    digest = np.frombuffer(hashlib.sha256((text or "").encode("utf-8")).digest(), dtype=np.uint8)
+    vector = np.resize(digest, EMBED_DIM).astype(np.float32) * (0.02 / 255.0) + 0.01
+    return normalize(vector)
+
+def _finish(raw: np.ndarray, texts: Sequence[str]) -> np.ndarray:
+    """Apply the shared policy to raw API rows, replacing all-zero rows."""
+    matrix = normalize(fit_dimension(raw))
+    dead = ~np.any(matrix, axis=-1)
+    for row in np.flatnonzero(dead):
+        matrix[row] = placeholder_vector(texts[row])
+    return matrix
+
+def _prepare(text: str) -> str:
+    return text.strip()[:MAX_EMBED_CHARS] if text else ""
+
+def _values(embedding) -> List[float]:
+    return embedding.values if hasattr(embedding, 'values') else list(embedding)
+
+def to_pinecone(vectors: Union[np.ndarray, Sequence[float]]) -> list:
+    """Convert a vector (or matrix of vectors) to the plain lists Pinecone expects."""
+    return np.asarray(vectors, dtype=np.float32).tolist()
+
+# ---------------- RATE LIMITING ----------------
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every embedding request in the process.
+
+    `rate` tokens are added per second up to `capacity`. Callers reserve a
+    token up front (the balance may go negative) and then sleep for however
+    long the reservation needs, so concurrent callers are spaced out fairly
+    and the same bucket works from any thread or event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return the number of seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+# One embed_content call (up to 100 texts) costs one token
+rate_limiter = TokenBucket(
+    rate=EMBED_REQUESTS_PER_MINUTE / 60.0,
+    capacity=max(1.0, EMBED_REQUESTS_PER_MINUTE / 60.0 * 5)
+)
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limits (429), server errors (5xx) and dropped connections."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None) or getattr(error, "status", None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "UNAVAILABLE" in message
+
+def backoff_delay(attempt: int, base: float = EMBED_BACKOFF_BASE, cap: float = EMBED_BACKOFF_MAX) -> float:
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+# ---------------- EMBEDDING FUNCTIONS ----------------
+def _split_cached(texts: List[str]):
+    """Fill cached and empty rows; return (prepared texts, matrix, rows still to embed)."""
+    prepared = [_prepare(t) for t in texts]
+    matrix = np.empty((len(texts), EMBED_DIM), dtype=np.float32)
+    cached = embedding_cache.get_many(EMBED_MODEL, EMBED_DIM, [t for t in prepared if t]) if texts else {}
+
+    pending = []
+    for i, text in enumerate(prepared):
+        if not text:
+            matrix[i] = placeholder_vector(text)
+        elif text in cached:
+            matrix[i] = _finish(cached[text], [text])
+        else:
+            pending.append(i)
+    return prepared, matrix, pending
+
+def _store_batch(matrix: np.ndarray, rows: List[int], batch: List[str], result):
+    values = [_values(e) for e in (result.embeddings or [])] if result else []
+    if len(values) != len(batch):
+        raise ValueError(f"expected {len(batch)} embeddings, got {len(values)}")
+    raw = np.asarray(values, dtype=np.float32)
+    embedding_cache.put_many(EMBED_MODEL, EMBED_DIM, dict(zip(batch, raw)))
+    matrix[rows] = _finish(raw, batch)
+
+def embed_texts(texts: List[str], batch_size: int = EMBED_BATCH_SIZE, strict: bool = False) -> np.ndarray:
+    """
+    Embed many texts with as few Gemini requests as possible.
+
+    Returns an (len(texts), EMBED_DIM) float32 matrix aligned with `texts`.
+    Cached texts are served locally; the rest are sent in batches of at most
+    `batch_size` (the API accepts up to 100 contents per request). Empty texts
+    and texts from a failed batch get their placeholder_vector, unless
+    `strict` is set, in which case a failed batch raises instead.
+    """
+    batch_size = max(1, min(batch_size, 100))
+    prepared, matrix, pending = _split_cached(texts)
+
+    for start in range(0, len(pending), batch_size):
+        rows = pending[start:start + batch_size]
+        batch = [prepared[i] for i in rows]
+        for attempt in range(EMBED_MAX_RETRIES + 1):
+            try:
+                if client is None:
+                    raise ValueError("GEMINI_API_KEY not found!")
+                rate_limiter.acquire()
+                result = client.models.embed_content(
+                    model=EMBED_MODEL,
+                    contents=batch,
+                    config=types.EmbedContentConfig(output_dimensionality=EMBED_DIM)
+                )
+                _store_batch(matrix, rows, batch, result)
+                break
+            except Exception as e:
+                if attempt < EMBED_MAX_RETRIES and is_retryable(e):
+                    time.sleep(backoff_delay(attempt))
+                    continue
+                if strict:
+                    raise
+                print(f"[ERROR] embed_texts: batch {start // batch_size + 1} failed: {e}")
+                for i in rows:
+                    matrix[i] = placeholder_vector(prepared[i])
+                break
+
+    return matrix
+
+def embed_text(text: str, memo: Optional[Dict[str, np.ndarray]] = None, strict: bool = False) -> np.ndarray:
+    """
+    Embed a single text; see embed_texts for the vector policy and `strict`.
+
+    `memo` is an optional request-scoped dict (e.g. one chat turn): a text
+    already embedded through the same memo is returned without any lookup.
+    """
+    key = _prepare(text)
+    if not key:
+        print("[WARNING] Empty text provided for embedding")
+    if memo is not None and key in memo:
+        return memo[key]
+    vector = embed_texts([text], strict=strict)[0]
+    if memo is not None:
+        memo[key] = vector
+    return vector
+
+# ---------------- ASYNC PIPELINE ----------------
+async def embed_texts_async(texts: List[str], batch_size: int = EMBED_BATCH_SIZE,
+                            max_concurrency: int = EMBED_MAX_CONCURRENCY,
+                            failed: Optional[Set[int]] = None) -> np.ndarray:
+    """
+    Concurrent version of embed_texts for large uploads.
+
+    Up to `max_concurrency` batches are in flight at once; every request
+    first takes a token from the shared rate_limiter, and 429/5xx responses
+    are retried with jittered exponential backoff. Prints chunks/sec when done.
+
+    Rows of a batch that still failed get their placeholder_vector; pass a
+    `failed` set to collect their indices so they are not stored as real
+    embeddings.
+    """
+    started = time.perf_counter()
+    batch_size = max(1, min(batch_size, 100))
+    prepared, matrix, pending = _split_cached(texts)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_batch(number: int, rows: List[int]):
+        batch = [prepared[i] for i in rows]
+        async with semaphore:
+            for attempt in range(EMBED_MAX_RETRIES + 1):
+                try:
+                    if client is None:
+                        raise ValueError("GEMINI_API_KEY not found!")
+                    await rate_limiter.acquire_async()
+                    result = await client.aio.models.embed_content(
+                        model=EMBED_MODEL,
+                        contents=batch,
+                        config=types.EmbedContentConfig(output_dimensionality=EMBED_DIM)
+                    )
+                    _store_batch(matrix, rows, batch, result)
+                    return
+                except Exception as e:
+                    if attempt < EMBED_MAX_RETRIES and is_retryable(e):
+                        await asyncio.sleep(backoff_delay(attempt))
+                        continue
+                    print(f"[ERROR] embed_texts_async: batch {number} failed: {e}")
+                    for i in rows:
+                        matrix[i] = placeholder_vector(prepared[i])
+                    if failed is not None:
+                        failed.update(rows)
+                    return
+
+    await asyncio.gather(*(
+        run_batch(n + 1, pending[start:start + batch_size])
+        for n, start in enumerate(range(0, len(pending), batch_size))
+    ))
+
+    elapsed = time.perf_counter() - started
+    if texts:
+        print(f"[INFO] Embedded {len(texts)} chunks ({len(pending)} via API) in {elapsed:.2f}s "
+              f"({len(texts) / max(elapsed, 1e-6):.1f} chunks/sec)")
+    return matrix
+
+def embed_texts_concurrent(texts: List[str], batch_size: int = EMBED_BATCH_SIZE,
+                           max_concurrency: int = EMBED_MAX_CONCURRENCY,
+                           failed: Optional[Set[int]] = None) -> np.ndarray:
+    """Run embed_texts_async from synchronous code (e.g. a Streamlit script)."""
+    coro = embed_texts_async(texts, batch_size=batch_size, max_concurrency=max_concurrency, failed=failed)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Already inside an event loop: run ours on a helper thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
@@ -0,0 +1,265 @@
+import io
+import os
+import re
+import mmap
+import zlib
+import hashlib
+import shutil
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Tuple
+from dotenv import load_dotenv
+import fitz  # PyMuPDF
+import docx2txt  # Word extraction
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_SPOOL_BYTES = int(os.getenv("EXTRACT_SPOOL_BYTES", str(32 * 1024 * 1024)))
+# Target size of the page-like sections unpaged text (DOCX, TXT, pasted notes) is cut into
+TEXT_SECTION_CHARS = int(os.getenv("TEXT_SECTION_CHARS", "3000"))
+
+# ---------------- DOCUMENT SOURCES ----------------
+# A document source is a file path, a bytes-like object, or a binary
+# file-like object such as Streamlit's UploadedFile.
+
+def _is_path(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+def source_extension(source, filename: str = None) -> str:
+    name = filename or (os.fspath(source) if _is_path(source) else getattr(source, "name", ""))
+    return os.path.splitext(str(name))[1].lower()
+
+def _source_size(source) -> int:
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer().nbytes
+    if isinstance(getattr(source, "size", None), int):
+        return source.size
+    position = source.tell()
+    source.seek(0, io.SEEK_END)
+    size = source.tell()
+    source.seek(position)
+    return size
+
+@contextmanager
+def document_source(source, suffix: str = ""):
+    """
+    Yield `source` as either a file path or an in-memory buffer.
+
+    Paths are passed through. Bytes and in-memory files up to
+    EXTRACT_SPOOL_BYTES are exposed as a memoryview without copying. Larger
+    file-like uploads are copied in chunks to a temporary file (never as one
+    more full in-memory copy), which is removed afterwards; PyMuPDF and the
+    process pool then read that file from disk.
+    """
+    if _is_path(source):
+        yield os.fspath(source)
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield memoryview(source)
+        return
+
+    if _source_size(source) <= EXTRACT_SPOOL_BYTES:
+        if hasattr(source, "getbuffer"):
+            view = source.getbuffer()
+            try:
+                yield view
+            finally:
+                view.release()
+        else:
+            source.seek(0)
+            yield memoryview(source.read())
+        return
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        source.seek(0)
+        shutil.copyfileobj(source, tmp, 1024 * 1024)
+        spill_path = tmp.name
+    try:
+        yield spill_path
+    finally:
+        try:
+            os.remove(spill_path)
+        except OSError:
+            pass
+
+def source_sha256(source) -> str:
+    """SHA-256 of a document's raw bytes, read in blocks for files on disk."""
+    digest = hashlib.sha256()
+    with document_source(source) as src:
+        if _is_path(src):
+            with open(src, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+        else:
+            digest.update(src)
+    return digest.hexdigest()
+
+def _open_pdf(source):
+    if _is_path(source):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+# ---------------- PARALLEL PDF EXTRACTION ----------------
+def _extract_page_range(source, start: int, stop: int) -> List[str]:
+    """Worker: open the PDF (path or bytes) in this process and return pages [start, stop)."""
+    with _open_pdf(source) as pdf:
+        return [pdf[i].get_text("text") for i in range(start, stop)]
+
+def _iter_pdf_pages_parallel(source, page_count: int, workers: int) -> Iterator[str]:
+    # A few shards per worker keeps the pool busy when some pages (scans,
+    # heavy vector art) are much slower than others. In-memory PDFs are
+    # pickled once per shard, so they get one shard per worker.
+    if _is_path(source):
+        shard = max(1, -(-page_count // (workers * 4)))
+    else:
+        source = bytes(source)
+        shard = max(1, -(-page_count // workers))
+    ranges = [(start, min(start + shard, page_count)) for start in range(0, page_count, shard)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_extract_page_range, source, start, stop) for start, stop in ranges]
+        # Collect in submission order so pages come back in document order
+        for future in futures:
+            yield from future.result()
+
+# ---------------- PAGE ITERATORS ----------------
+def iter_pdf_pages(source, min_parallel_pages: int = PDF_PARALLEL_MIN_PAGES,
+                   workers: int = PDF_EXTRACT_WORKERS) -> Iterator[str]:
+    """
+    Yield the text of each PDF page in order.
+
+    `source` is a path or a bytes-like object. PDFs with at least
+    `min_parallel_pages` pages are split into page ranges that a process pool
+    extracts in parallel; smaller files (or workers <= 1) are read serially
+    without holding the whole text.
+    """
+    with _open_pdf(source) as pdf:
+        page_count = pdf.page_count
+        if workers <= 1 or page_count < max(1, min_parallel_pages):
+            for page in pdf:
+                yield page.get_text("text")
+            return
+    yield from _iter_pdf_pages_parallel(source, page_count, workers)
+
+def iter_document_pages(source, filename: str = None) -> Iterator[str]:
+    """
+    Yield a document page by page (DOCX and TXT, which have no pages, come
+    out as iter_text_sections).
+
+    `source` may be a path, bytes, or a file-like upload; `filename` supplies
+    the extension when the source has no name of its own.
+    """
+    ext = source_extension(source, filename)
+    if ext not in (".pdf", ".docx", ".txt"):
+        raise ValueError(f"Unsupported file format: {ext}")
+    with document_source(source, ext) as src:
+        if ext == ".pdf":
+            yield from iter_pdf_pages(src)
+        elif ext == ".docx":
+            yield from iter_text_sections(extract_text_from_docx(src))
+        else:
+            yield from iter_text_sections(extract_text_from_txt(src))
+
+# ---------------- FILE EXTRACTION HELPERS ----------------
+def extract_text_from_pdf(source):
+    with document_source(source, ".pdf") as src:
+        return "\n".join(iter_pdf_pages(src)).strip()
+
+def extract_text_from_docx(source):
+    with document_source(source, ".docx") as src:
+        return docx2txt.process(src if _is_path(src) else io.BytesIO(src)).strip()
+
+def extract_text_from_txt(source):
+    with document_source(source, ".txt") as src:
+        if not _is_path(src):
+            return str(src, "utf-8").strip()
+        with open(src, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, "utf-8").strip()
+
+def extract_text(source, filename: str = None):
+    """Extract text from a path, bytes or file-like upload (PDF, DOCX or TXT)."""
+    ext = source_extension(source, filename)
+    if ext == ".pdf":
+        return extract_text_from_pdf(source)
+    elif ext == ".docx":
+        return extract_text_from_docx(source)
+    elif ext == ".txt":
+        return extract_text_from_txt(source)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+# ---------------- STREAMING CHUNKER ----------------
+def iter_text_sections(text: str, target_chars: int = TEXT_SECTION_CHARS) -> Iterator[str]:
+    """
+    Split unpaged text into page-like sections at paragraph breaks.
+
+    A section ends after a paragraph whose own content hash says so (once it
+    holds a quarter of `target_chars`), or when it reaches `target_chars`.
+    Because cut points depend on paragraph content rather than offsets, an
+    edit usually re-chunks only its own section instead of shifting every
+    later chunk boundary.
+    """
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if len(paragraph) > target_chars:
+            # No blank lines to cut at: fall back to line breaks
+            paragraphs.extend(line.strip() for line in paragraph.splitlines() if line.strip())
+        elif paragraph:
+            paragraphs.append(paragraph)
+    section: List[str] = []
+    size = 0
+    for paragraph in paragraphs:
+        section.append(paragraph)
+        size += len(paragraph)
+        content_cut = zlib.crc32(paragraph.encode("utf-8")) % 4 == 0 and size >= target_chars // 4
+        if size >= target_chars or content_cut:
+            yield "\n\n".join(section)
+            section, size = [], 0
+    if section:
+        yield "\n\n".join(section)
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+def iter_sentences(pages: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, sentence) pairs; page numbers start at 1."""
+    for page_number, page in enumerate(pages, 1):
+        page = page.strip()
+        if not page:
+            continue
+        for sentence in _SENTENCE_BOUNDARY.split(page):
+            yield page_number, sentence
+
+def iter_chunks(sentences: Iterable[Tuple[int, str]], max_chars: int = 800) -> Iterator[str]:
+    """
+    Greedily pack sentences into chunks of at most `max_chars`.
+
+    Chunks never span pages, so an edit on one page only changes that page's
+    chunks. A single sentence longer than `max_chars` becomes its own chunk.
+    """
+    parts: List[str] = []
+    length = 0
+    current_page = None
+    for page_number, sentence in sentences:
+        if parts and page_number != current_page:
+            yield " ".join(parts)
+            parts, length = [], 0
+        current_page = page_number
+        if not parts:
+            parts, length = [sentence], len(sentence)
+        elif length + len(sentence) + 1 <= max_chars:
+            parts.append(sentence)
+            length += len(sentence) + 1
+        else:
+            yield " ".join(parts)
+            parts, length = [sentence], len(sentence)
+    if parts:
+        yield " ".join(parts)
+
+def chunk_text(text: str, max_chars: int = 800) -> List[str]:
+    return list(iter_chunks(iter_sentences([text]), max_chars))
@@ -0,0 +1,151 @@
+import os
+import time
+import zlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from Extraction import extract_text, source_sha256
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+EXTRACT_CACHE_PATH = os.getenv("EXTRACT_CACHE_PATH", os.path.join(".studybuddy", "extraction_cache.sqlite3"))
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "4"))
+
+# ---------------- EXTRACTION CACHE ----------------
+class ExtractionCache:
+    """
+    On-disk cache of extracted document text keyed by sha256 of the file bytes.
+
+    Text is stored zlib-compressed in SQLite. Every hit refreshes `last_used`,
+    and once the compressed total exceeds `max_bytes` the least recently used
+    documents are evicted.
+    """
+
+    def __init__(self, path: str = EXTRACT_CACHE_PATH, max_bytes: int = EXTRACT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                " file_hash TEXT PRIMARY KEY,"
+                " text BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions(last_used)")
+            self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Extraction cache disabled ({path}): {e}")
+            self._conn = None
+
+    def get(self, file_hash: str) -> Optional[str]:
+        text = None
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT text FROM extractions WHERE file_hash = ?", (file_hash,)
+                    ).fetchone()
+                    if row:
+                        self._conn.execute(
+                            "UPDATE extractions SET last_used = ? WHERE file_hash = ?", (time.time(), file_hash)
+                        )
+                        self._conn.commit()
+                if row:
+                    text = zlib.decompress(row[0]).decode("utf-8")
+            except Exception as e:
+                print(f"[WARNING] Extraction cache read failed: {e}")
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, file_hash: str, text: str):
+        if self._conn is None:
+            return
+        blob = zlib.compress(text.encode("utf-8"), 6)
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extractions (file_hash, text, size, last_used) VALUES (?, ?, ?, ?)",
+                    (file_hash, blob, len(blob), time.time())
+                )
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+                if total > self.max_bytes:
+                    rows = self._conn.execute(
+                        "SELECT file_hash, size FROM extractions ORDER BY last_used ASC"
+                    ).fetchall()
+                    evict = []
+                    for old_hash, size in rows:
+                        if total <= self.max_bytes or old_hash == file_hash:
+                            break
+                        evict.append((old_hash,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM extractions WHERE file_hash = ?", evict)
+                self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Extraction cache write failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        entries, total = 0, 0
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    entries, total = self._conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+                    ).fetchone()
+            except Exception:
+                pass
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes
+        }
+
+extraction_cache = ExtractionCache()
+
+def extract_text_cached(source, filename: str = None) -> Tuple[str, str, bool]:
+    """
+    Extract text through the cache.
+
+    Returns (text, file_hash, cache_hit); file_hash identifies the upload for
+    the document manifest as well.
+    """
+    file_hash = source_sha256(source)
+    text = extraction_cache.get(file_hash)
+    if text is not None:
+        return text, file_hash, True
+    text = extract_text(source, filename)
+    if text:
+        extraction_cache.put(file_hash, text)
+    return text, file_hash, False
+
+def extract_texts_cached(sources: Sequence[Tuple[object, str]],
+                         max_workers: int = EXTRACT_CONCURRENCY) -> List[Tuple[str, str, bool]]:
+    """
+    extract_text_cached for several (source, filename) pairs at once.
+
+    Files are hashed and parsed on a small thread pool (PyMuPDF releases the
+    GIL while rendering text), and results come back in input order.
+    """
+    if len(sources) <= 1 or max_workers <= 1:
+        return [extract_text_cached(source, filename) for source, filename in sources]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(sources))) as pool:
+        return list(pool.map(lambda item: extract_text_cached(*item), sources))
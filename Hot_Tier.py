@@ -0,0 +1,203 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+from Vector_Store import LocalVectorStore, QueryResult, get_vector_store, user_namespace
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+HOT_TIER_ENABLED = os.getenv("HOT_TIER_ENABLED", "1") == "1"
+# Note vectors kept in memory across all users (~3KB each at 768 dims plus
+# metadata); least recently used users are dropped to stay under it
+HOT_TIER_MAX_VECTORS_TOTAL = int(os.getenv("HOT_TIER_MAX_VECTORS_TOTAL", "60000"))
+# Users with more note vectors than this keep querying the remote index
+HOT_TIER_MAX_USER_VECTORS = int(os.getenv("HOT_TIER_MAX_USER_VECTORS", "5000"))
+HOT_TIER_FETCH_WORKERS = int(os.getenv("HOT_TIER_FETCH_WORKERS", "4"))  # concurrent fetch calls per load
+
+# ---------------- NOTES HOT TIER ----------------
+_LOADING, _READY, _TOO_LARGE = "loading", "ready", "too_large"
+
+class NotesHotTier:
+    """
+    In-memory copy of recently active users' note vectors.
+
+    A user's notes are fetched from the vector store once (at login, or on
+    their first search) into an in-process LocalVectorStore, one namespace
+    per user, and searched there with NumPy instead of a remote query.
+    Writes made through store_notes are applied to the loaded copy as they
+    land, so it never has to be reloaded. The tier holds at most
+    `max_vectors_total` vectors; least recently used users are dropped to
+    stay under it. Users with more than `max_user_vectors` notes are never
+    loaded (their listing is counted before anything is fetched).
+
+    Also keeps a per-user knowledge-base version, bumped on every note write
+    or delete, for caches of answers derived from the notes.
+    """
+
+    def __init__(self, max_vectors_total: int = HOT_TIER_MAX_VECTORS_TOTAL,
+                 max_user_vectors: int = HOT_TIER_MAX_USER_VECTORS, fetch_workers: int = HOT_TIER_FETCH_WORKERS):
+        self.max_vectors_total = max_vectors_total
+        self.max_user_vectors = min(max_user_vectors, max_vectors_total)
+        self.fetch_workers = max(1, fetch_workers)
+        self._store = LocalVectorStore(path="")
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, str]" = OrderedDict()
+        self._pending: Dict[str, List[tuple]] = {}  # writes that arrive while a user is loading
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self._enabled = None
+
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            # Nothing to gain when the backing store is already in-process
+            self._enabled = HOT_TIER_ENABLED and not isinstance(get_vector_store(), LocalVectorStore)
+        return self._enabled
+
+    # ---- loading ----
+    def warm(self, user_id: str, background: bool = True):
+        """Start loading a user's notes unless they are loaded or loading already."""
+        if not user_id or not self.enabled():
+            return
+        with self._lock:
+            if user_id in self._users:
+                self._users.move_to_end(user_id)
+                return
+            self._users[user_id] = _LOADING
+            self._pending[user_id] = []
+        if background:
+            threading.Thread(target=self._load, args=(user_id,), name=f"hot-tier-{user_id}", daemon=True).start()
+        else:
+            self._load(user_id)
+
+    def _load(self, user_id: str):
+        remote = get_vector_store()
+        namespace = user_namespace(user_id)
+        try:
+            ids = [vector_id for page in remote.list(prefix=f"{user_id}_notes_", namespace=namespace)
+                   for vector_id in page]
+            if len(ids) > self.max_user_vectors:
+                with self._lock:
+                    self._users[user_id] = _TOO_LARGE
+                    self._pending.pop(user_id, None)
+                print(f"[INFO] Hot tier: {len(ids)} note vectors for user {user_id}, serving remotely")
+                return
+            batches = [ids[i:i + 100] for i in range(0, len(ids), 100)]
+            vectors = []
+            if batches:
+                with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(batches))) as pool:
+                    for fetched in pool.map(lambda batch: remote.fetch(ids=batch, namespace=namespace), batches):
+                        for vector_id, vector in (getattr(fetched, "vectors", None) or {}).items():
+                            vectors.append({"id": vector_id, "values": list(vector.values),
+                                            "metadata": dict(vector.metadata or {})})
+        except Exception as e:
+            print(f"[WARNING] Hot tier load failed for user {user_id}: {e}")
+            with self._lock:
+                self._users.pop(user_id, None)
+                self._pending.pop(user_id, None)
+            return
+
+        with self._lock:
+            if self._users.get(user_id) != _LOADING:
+                return  # evicted while loading
+            if vectors:
+                self._store.upsert(vectors, namespace=user_id)
+            # Replay writes that landed after the listing started
+            for op, payload in self._pending.pop(user_id, []):
+                if op == "upsert":
+                    self._store.upsert(payload, namespace=user_id)
+                else:
+                    self._store.delete(ids=payload, namespace=user_id)
+            self._users[user_id] = _READY
+            self._users.move_to_end(user_id)
+            self._evict_locked()
+        print(f"[INFO] Hot tier: loaded {len(vectors)} note vectors for user {user_id}")
+
+    def _evict_locked(self):
+        """Drop least recently used users until the tier is within its vector budget."""
+        counts = {name: ns["vector_count"] for name, ns in self._store.describe_index_stats()["namespaces"].items()}
+        total = sum(counts.values())
+        # The most recently used user is kept even if it alone fills the budget
+        for user_id in list(self._users)[:-1]:
+            if total <= self.max_vectors_total:
+                break
+            if self._users[user_id] == _LOADING:
+                continue
+            del self._users[user_id]
+            self._pending.pop(user_id, None)
+            self._store.delete(delete_all=True, namespace=user_id)
+            total -= counts.get(user_id, 0)
+
+    def evict(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._pending.pop(user_id, None)
+            self._store.delete(delete_all=True, namespace=user_id)
+
+    # ---- reads ----
+    def query(self, user_id: str, vector: Sequence[float], top_k: int = 10,
+              filter: Optional[Dict[str, Any]] = None) -> Optional[QueryResult]:
+        """
+        Search a user's notes locally; None means "not loaded, ask the remote
+        index" (a load is started in the background).
+        """
+        if not user_id or not self.enabled():
+            return None
+        with self._lock:
+            state = self._users.get(user_id)
+            if state == _READY:
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return self._store.query(vector, top_k=top_k, filter=filter, namespace=user_id)
+            self.misses += 1
+        if state is None:
+            self.warm(user_id)
+        return None
+
+    # ---- writes ----
+    def apply_upsert(self, vectors: List[Dict[str, Any]]):
+        """Mirror note vectors that were just stored (grouped by their user_id metadata)."""
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for vector in vectors:
+            user_id = (vector.get("metadata") or {}).get("user_id")
+            if user_id:
+                by_user.setdefault(user_id, []).append(vector)
+        with self._lock:
+            for user_id, group in by_user.items():
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                self._apply_locked(user_id, "upsert", group)
+            self._evict_locked()
+
+    def apply_delete(self, user_id: str, ids: List[str]):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._apply_locked(user_id, "delete", list(ids))
+
+    def _apply_locked(self, user_id: str, op: str, payload):
+        state = self._users.get(user_id)
+        if state == _LOADING:
+            self._pending[user_id].append((op, payload))
+        elif state == _READY:
+            if op == "upsert":
+                self._store.upsert(payload, namespace=user_id)
+            else:
+                self._store.delete(ids=payload, namespace=user_id)
+
+    def kb_version(self, user_id: str) -> int:
+        """Changes whenever the user's notes change in this process."""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": sum(1 for s in self._users.values() if s == _READY),
+                "loading": sum(1 for s in self._users.values() if s == _LOADING),
+                "vectors": self._store.describe_index_stats()["total_vector_count"],
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+notes_hot_tier = NotesHotTier()
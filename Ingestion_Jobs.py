@@ -0,0 +1,194 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from Extraction import iter_document_pages, iter_text_sections
+from Notes_Quiz_Section import NotesBatcher, store_notes_stream
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_FILE_WORKERS = int(os.getenv("INGEST_FILE_WORKERS", "4"))
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", "3600"))  # keep finished jobs for an hour
+
+# ---------------- BACKGROUND INGESTION JOBS ----------------
+# The pool and job table live at module level, so they are shared by every
+# Streamlit session in this process and survive script reruns.
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+# Files of every job are extracted and chunked on this second, shared pool;
+# embedding requests from all of them go through the Embeddings rate limiter.
+_file_executor = ThreadPoolExecutor(max_workers=INGEST_FILE_WORKERS, thread_name_prefix="ingest-file")
+_jobs: Dict[str, "IngestionJob"] = {}
+_jobs_lock = threading.Lock()
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+class IngestionJob:
+    """Extract → chunk → embed → upsert run for one or more documents, with progress counters."""
+
+    def __init__(self, user_id: str, document_names: List[str]):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.documents = list(document_names)
+        self.document_name = self.documents[0] if len(self.documents) == 1 else f"{len(self.documents)} files"
+        self.status = "queued"
+        self.error = None
+        self.progress = {
+            "files_total": len(self.documents),
+            "files_done": 0,
+            "pages_parsed": 0,
+            "chunks_embedded": 0,
+            "chunks_unchanged": 0,
+            "vectors_upserted": 0
+        }
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_progress(self, stage: str, count: int = 1):
+        with self._lock:
+            self.progress[stage] = self.progress.get(stage, 0) + count
+
+    def set_status(self, status: str, error: str = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            if status == "running":
+                self.started_at = time.time()
+            elif status in FINISHED_STATES:
+                self.finished_at = time.time()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.job_id,
+                "user_id": self.user_id,
+                "document_name": self.document_name,
+                "documents": list(self.documents),
+                "status": self.status,
+                "error": self.error,
+                "progress": dict(self.progress),
+                "elapsed": round(end - self.started_at, 2) if self.started_at else 0.0,
+                "created_at": self.created_at
+            }
+
+def _ingest_file(job: IngestionJob, batcher: NotesBatcher, source, filename: str,
+                 source_hash: str, user_timezone, text: Optional[str] = None):
+    if job.cancelled():
+        return
+
+    def pages():
+        # Text the caller already extracted is sectioned instead of parsed again
+        sections = iter_text_sections(text) if text is not None else iter_document_pages(source, filename)
+        for page in sections:
+            job.add_progress("pages_parsed")
+            yield page
+
+    store_notes_stream(
+        job.user_id,
+        pages(),
+        user_timezone,
+        document_name=filename,
+        source_hash=source_hash,
+        on_progress=job.add_progress,
+        should_cancel=job.cancelled,
+        batcher=batcher
+    )
+    job.add_progress("files_done")
+
+def _run_job(job: IngestionJob, files: List[Tuple[Any, str, Optional[str], Optional[str]]], user_timezone):
+    if job.cancelled():
+        job.set_status("cancelled")
+        return
+    job.set_status("running")
+    # One batcher per job: chunks from all files share embed/upsert batches
+    batcher = NotesBatcher(on_progress=job.add_progress)
+    try:
+        futures = {
+            _file_executor.submit(_ingest_file, job, batcher, source, filename, source_hash, user_timezone, text): filename
+            for source, filename, source_hash, text in files
+        }
+        errors = []
+        for future, filename in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[ERROR] ingestion job {job.job_id}: {filename}: {e}")
+                errors.append(f"{filename}: {e}")
+
+        if job.cancelled():
+            batcher.discard()
+            job.set_status("cancelled")
+            return
+        try:
+            batcher.close()
+        except Exception as e:
+            # Chunks of a file can fail in a batch flushed by another file's thread
+            print(f"[ERROR] ingestion job {job.job_id}: {e}")
+            errors.append(str(e))
+        job.set_status("failed" if errors else "completed", "; ".join(errors) or None)
+    except Exception as e:
+        print(f"[ERROR] ingestion job {job.job_id}: {e}")
+        job.set_status("failed", str(e))
+
+def _prune_jobs():
+    cutoff = time.time() - INGEST_JOB_TTL
+    with _jobs_lock:
+        for job_id in [j.job_id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del _jobs[job_id]
+
+def submit_ingestion_batch(user_id: str, files: List[Tuple],
+                           user_timezone=None) -> str:
+    """
+    Queue several documents as one background job and return its job ID.
+
+    `files` holds (source, filename, source_hash) tuples, where `source` is a
+    path or bytes (pass `uploaded_file.getvalue()` rather than the
+    UploadedFile itself, which Streamlit may release after the rerun). An
+    optional fourth item is the file's already extracted text: it is cut
+    with iter_text_sections instead of parsing `source` again, and `source`
+    may then be None. Files are processed concurrently and their chunks are
+    embedded and upserted in shared batches; progress is aggregated across
+    all of them.
+    """
+    _prune_jobs()
+    files = [tuple(item) + (None,) * (4 - len(item)) for item in files]
+    job = IngestionJob(user_id, [filename for _, filename, _, _ in files])
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    _executor.submit(_run_job, job, files, user_timezone)
+    return job.job_id
+
+def submit_ingestion(user_id: str, source, filename: str, source_hash: str = None,
+                     user_timezone=None, text: str = None) -> str:
+    """Queue a single document for background ingestion and return its job ID."""
+    return submit_ingestion_batch(user_id, [(source, filename, source_hash, text)], user_timezone)
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """Cheap, lock-protected snapshot of a job's state for UI polling."""
+    job = _jobs.get(job_id)
+    return job.snapshot() if job else None
+
+def cancel_job(job_id: str) -> bool:
+    job = _jobs.get(job_id)
+    if not job or job.status in FINISHED_STATES:
+        return False
+    job.cancel()
+    return True
+
+def list_jobs(user_id: str) -> List[Dict[str, Any]]:
+    with _jobs_lock:
+        jobs = [j for j in _jobs.values() if j.user_id == user_id]
+    return [j.snapshot() for j in sorted(jobs, key=lambda j: j.created_at, reverse=True)]
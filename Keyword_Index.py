@@ -0,0 +1,262 @@
+import os
+import re
+import math
+import heapq
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Set
+from dotenv import load_dotenv
+from Vector_Store import Match, get_vector_store, user_namespace
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", os.path.join(".studybuddy", "keywords.sqlite3"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Share of the query's terms a keyword-only hit must contain to be used
+# without a matching vector score
+KEYWORD_MIN_COVERAGE = float(os.getenv("KEYWORD_MIN_COVERAGE", "0.6"))
+
+# ---------------- TOKENIZER ----------------
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i in is it its of on or that the their this "
+    "to was were what when where which who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; formula names, acronyms and course codes stay whole (e.g. "cs101")."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+# ---------------- KEYWORD INDEX ----------------
+class KeywordIndex:
+    """
+    Per-user inverted index over note chunk text, scored with BM25.
+
+    Complements the dense vector search for exact-term queries that
+    embeddings blur. Postings are kept in SQLite and updated incrementally
+    as chunks are upserted or deleted; document frequencies and lengths are
+    counted within one user's chunks only.
+    """
+
+    def __init__(self, path: str = KEYWORD_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._backfilled: Set[str] = set()  # users checked against the vector store this process
+        self._backfilling: Set[str] = set()
+        self._conn = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " user_id TEXT NOT NULL,"
+                " chunk_id TEXT NOT NULL,"
+                " length INTEGER NOT NULL,"
+                " text TEXT NOT NULL,"
+                " document_name TEXT,"
+                " PRIMARY KEY (user_id, chunk_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " user_id TEXT NOT NULL,"
+                " term TEXT NOT NULL,"
+                " chunk_id TEXT NOT NULL,"
+                " tf INTEGER NOT NULL,"
+                " PRIMARY KEY (user_id, term, chunk_id)) WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(user_id, chunk_id)")
+            self._conn.commit()
+        except Exception as e:
+            # Retrieval falls back to vector search alone
+            print(f"[WARNING] Keyword index disabled ({path}): {e}")
+            self._conn = None
+
+    def add(self, vectors: Iterable[Dict[str, Any]]):
+        """Index note vectors (upsert records whose metadata has user_id and text)."""
+        if self._conn is None:
+            return
+        rows, postings, replaced = [], [], []
+        for vector in vectors:
+            meta = vector.get("metadata") or {}
+            user_id, text = meta.get("user_id"), meta.get("text")
+            if not user_id or not text:
+                continue
+            counts = Counter(tokenize(text))
+            replaced.append((user_id, vector["id"]))
+            rows.append((user_id, vector["id"], sum(counts.values()), text, meta.get("document_name")))
+            postings.extend((user_id, term, vector["id"], tf) for term, tf in counts.items())
+        if not rows:
+            return
+        try:
+            with self._lock:
+                self._conn.executemany("DELETE FROM postings WHERE user_id = ? AND chunk_id = ?", replaced)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (user_id, chunk_id, length, text, document_name) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.executemany("INSERT INTO postings (user_id, term, chunk_id, tf) VALUES (?, ?, ?, ?)", postings)
+                self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Keyword index update failed: {e}")
+
+    def remove(self, user_id: str, chunk_ids: Iterable[str]):
+        if self._conn is None:
+            return
+        keys = [(user_id, chunk_id) for chunk_id in chunk_ids]
+        try:
+            with self._lock:
+                self._conn.executemany("DELETE FROM postings WHERE user_id = ? AND chunk_id = ?", keys)
+                self._conn.executemany("DELETE FROM chunks WHERE user_id = ? AND chunk_id = ?", keys)
+                self._conn.commit()
+        except Exception as e:
+            print(f"[WARNING] Keyword index delete failed: {e}")
+
+    def remove_user(self, user_id: str):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._backfilled.discard(user_id)
+            self._conn.execute("DELETE FROM postings WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM chunks WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    def chunk_ids(self, user_id: str) -> Set[str]:
+        if self._conn is None:
+            return set()
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM chunks WHERE user_id = ?", (user_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def backfill(self, user_id: str, store=None) -> int:
+        """
+        Index a user's note chunks that are in the vector store but not here
+        (stored before the keyword index existed). Only the missing chunks
+        are fetched; returns how many were indexed.
+        """
+        if self._conn is None or not user_id:
+            return 0
+        store = store or get_vector_store()
+        namespace = user_namespace(user_id)
+        indexed = self.chunk_ids(user_id)
+        missing = [vector_id for page in store.list(prefix=f"{user_id}_notes_", namespace=namespace)
+                   for vector_id in page if vector_id not in indexed]
+        added = 0
+        for i in range(0, len(missing), 100):
+            fetched = store.fetch(ids=missing[i:i + 100], namespace=namespace)
+            vectors = [{"id": vector_id, "metadata": dict(vector.metadata or {})}
+                       for vector_id, vector in (getattr(fetched, "vectors", None) or {}).items()]
+            self.add(vectors)
+            added += len(vectors)
+        return added
+
+    def ensure_backfilled(self, user_id: str):
+        """Backfill a user once per process, in the background."""
+        if self._conn is None or not user_id:
+            return
+        with self._lock:
+            if user_id in self._backfilled:
+                return
+            self._backfilled.add(user_id)
+            self._backfilling.add(user_id)
+
+        def run():
+            try:
+                added = self.backfill(user_id)
+                if added:
+                    print(f"[INFO] Keyword index: backfilled {added} note chunks for user {user_id}")
+            except Exception as e:
+                print(f"[WARNING] Keyword backfill failed for user {user_id}: {e}")
+                with self._lock:
+                    self._backfilled.discard(user_id)
+            finally:
+                with self._lock:
+                    self._backfilling.discard(user_id)
+
+        threading.Thread(target=run, name=f"keyword-backfill-{user_id}", daemon=True).start()
+
+    def backfilling(self, user_id: str) -> bool:
+        """True while a user's backfill runs; their searches may miss older notes."""
+        with self._lock:
+            return user_id in self._backfilling
+
+    def search(self, user_id: str, query: str, top_k: int = 10) -> List[Match]:
+        """
+        BM25 top-k of the user's chunks, as matches with notes metadata (best
+        first). metadata["term_coverage"] is the share of the query's terms
+        found in the chunk. Database errors are raised to the caller.
+        """
+        terms = set(tokenize(query))
+        if self._conn is None or not terms or not user_id:
+            return []
+        # Notes stored before the index existed are picked up from the first search on
+        self.ensure_backfilled(user_id)
+        scores: Dict[str, float] = {}
+        matched: Counter = Counter()
+        with self._lock:
+            count, avg_length = self._conn.execute(
+                "SELECT COUNT(*), AVG(length) FROM chunks WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if not count:
+                return []
+            avg_length = avg_length or 1.0
+            for term in terms:
+                postings = self._conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length FROM postings p"
+                    " JOIN chunks c ON c.user_id = p.user_id AND c.chunk_id = p.chunk_id"
+                    " WHERE p.user_id = ? AND p.term = ?", (user_id, term)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf, length in postings:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    matched[chunk_id] += 1
+            top = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            if not top:
+                return []
+            placeholders = ",".join("?" * len(top))
+            details = {
+                chunk_id: (text, document_name)
+                for chunk_id, text, document_name in self._conn.execute(
+                    f"SELECT chunk_id, text, document_name FROM chunks WHERE user_id = ? AND chunk_id IN ({placeholders})",
+                    [user_id] + [chunk_id for chunk_id, _ in top]
+                )
+            }
+        matches = []
+        for chunk_id, score in top:
+            text, document_name = details.get(chunk_id, ("", None))
+            metadata = {"type": "notes", "user_id": user_id, "text": text,
+                        "term_coverage": matched[chunk_id] / len(terms)}
+            if document_name:
+                metadata["document_name"] = document_name
+            matches.append(Match(id=chunk_id, score=score, metadata=metadata))
+        return matches
+
+keyword_index = KeywordIndex()
+
+# ---------------- RANK FUSION ----------------
+def reciprocal_rank_fusion(*rankings: List[Match], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Merge ranked match lists by reciprocal rank: sum of 1 / (k + rank).
+
+    Returns {"id", "metadata", "score" (fused), "vector_score"} dicts, best
+    first. The first list is taken to be the dense one; its similarity is
+    kept as vector_score (None for matches found by keyword only).
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for position, ranking in enumerate(rankings):
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.setdefault(match.id, {
+                "id": match.id, "metadata": match.metadata or {}, "score": 0.0, "vector_score": None
+            })
+            entry["score"] += 1.0 / (k + rank)
+            if position == 0:
+                entry["vector_score"] = match.score
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
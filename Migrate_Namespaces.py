@@ -0,0 +1,102 @@
+import argparse
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from Upsert_Engine import upsert_vectors
+from Vector_Store import get_vector_store, user_namespace, delete_user_vectors
+from Document_Manifest import document_manifest
+from Document_Store import document_store
+from Keyword_Index import keyword_index
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+# Where notes, quizzes and progress (default namespace) and chat turns
+# ("chat_history") lived before the per-user layout
+LEGACY_NAMESPACES = ("", "chat_history")
+
+# ---------------- MIGRATION ----------------
+def _list_ids(store, namespace: str) -> List[str]:
+    # Collected up front so deleting migrated vectors can't shift the pages
+    return [vector_id for page in store.list(namespace=namespace or None) for vector_id in page]
+
+def migrate_namespace(store, source: str, dry_run: bool = False, keep: bool = False) -> Dict[str, Any]:
+    """
+    Move every user-owned vector of `source` into its owner's namespace.
+
+    Vectors are fetched and re-upserted with their stored values, so nothing
+    is embedded again. They are deleted from `source` only after their batch
+    landed in the target; vectors without a user_id stay where they are.
+    Moved note chunks are added to the keyword index on the way.
+    """
+    ids = _list_ids(store, source)
+    stats = {"namespace": source or "(default)", "listed": len(ids), "moved": 0, "failed": 0, "skipped": 0}
+    targets: Dict[str, int] = {}
+    for i in range(0, len(ids), 100):
+        fetched = store.fetch(ids=ids[i:i + 100], namespace=source or None)
+        by_namespace: Dict[str, List[Dict[str, Any]]] = {}
+        for vector_id, vector in (getattr(fetched, "vectors", None) or {}).items():
+            metadata = dict(vector.metadata or {})
+            user_id = metadata.get("user_id")
+            if not user_id:
+                stats["skipped"] += 1
+                continue
+            by_namespace.setdefault(user_namespace(user_id), []).append(
+                {"id": vector_id, "values": list(vector.values), "metadata": metadata}
+            )
+        for namespace, records in by_namespace.items():
+            targets[namespace] = targets.get(namespace, 0) + len(records)
+            if dry_run:
+                stats["moved"] += len(records)
+                continue
+            result = upsert_vectors(store, records, namespace=namespace)
+            failed_ids = set(result["failed_ids"])
+            moved = [record["id"] for record in records if record["id"] not in failed_ids]
+            stats["moved"] += len(moved)
+            stats["failed"] += len(failed_ids)
+            keyword_index.add(record for record in records
+                              if record["id"] not in failed_ids and record["metadata"].get("type") == "notes")
+            if moved and not keep:
+                store.delete(ids=moved, namespace=source or None)
+    stats["target_namespaces"] = len(targets)
+    return stats
+
+def delete_user_data(user_id: str, store=None) -> int:
+    """Drop a user's vectors, manifest entries, stored payloads and keyword postings."""
+    store = store or get_vector_store()
+    deleted = delete_user_vectors(store, user_id)
+    document_manifest.remove_user(user_id)
+    document_store.delete_user(user_id)
+    keyword_index.remove_user(user_id)
+    return deleted
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Move StudyBuddy vectors into per-user namespaces.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be moved")
+    parser.add_argument("--keep", action="store_true", help="copy without deleting from the old namespaces")
+    parser.add_argument("--namespace", action="append", dest="namespaces",
+                        help="source namespace to migrate (repeatable; default: the default namespace and chat_history)")
+    parser.add_argument("--delete-user", metavar="USER_ID", help="delete all data of one user instead of migrating")
+    parser.add_argument("--reindex-keywords", metavar="USER_ID", action="append", dest="reindex_users",
+                        help="add a user's stored note chunks missing from the keyword index instead of migrating (repeatable)")
+    args = parser.parse_args(argv)
+
+    store = get_vector_store()
+    if args.reindex_users:
+        for user_id in args.reindex_users:
+            added = keyword_index.backfill(user_id, store)
+            print(f"[INFO] Keyword index: {added} note chunks added for user {user_id}")
+        return
+
+    if args.delete_user:
+        deleted = delete_user_data(args.delete_user, store)
+        print(f"[INFO] Deleted data of user {args.delete_user}"
+              + (f" ({deleted} vectors)" if deleted >= 0 else f" (namespace {user_namespace(args.delete_user)})"))
+        return
+
+    for source in args.namespaces or LEGACY_NAMESPACES:
+        stats = migrate_namespace(store, source, dry_run=args.dry_run, keep=args.keep)
+        verb = "would move" if args.dry_run else "moved"
+        print(f"[INFO] {stats['namespace']}: {verb} {stats['moved']}/{stats['listed']} vectors into "
+              f"{stats['target_namespaces']} namespaces ({stats['failed']} failed, {stats['skipped']} without user_id)")
+
+if __name__ == "__main__":
+    main()
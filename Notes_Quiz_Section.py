@@ -2,16 +2,13 @@ import os
 import json
 import time
 import re
-import random
 import hashlib
+import threading
 from datetime import datetime
 from typing import List, Dict, Any, Generator
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
-from pinecone import Pinecone, ServerlessSpec
-import fitz  # PyMuPDF
-import docx2txt  # Word extraction
 from langchain_groq import ChatGroq
 from langchain.agents import create_agent
 from langgraph.checkpoint.memory import MemorySaver
@@ -19,35 +16,40 @@ from langchain_core.tools import tool
 from tavily import TavilyClient
 import wikipedia
 import requests
+from Embeddings import embed_text, embed_texts, embed_texts_concurrent, placeholder_vector, to_pinecone
+from Document_Manifest import document_manifest
+from Upsert_Engine import existing_ids, group_by_namespace, upsert_vectors, write_records
+from Write_Ahead_Log import DurableQueue
+from Document_Store import document_store
+from Vector_Store import get_vector_store, record_namespace, user_namespace
+from Hot_Tier import notes_hot_tier
+from Keyword_Index import keyword_index
+from Extraction import (
+    iter_document_pages,
+    iter_text_sections,
+    iter_sentences,
+    iter_chunks,
+    chunk_text,
+    extract_text,
+    extract_text_from_pdf,
+    extract_text_from_docx,
+    extract_text_from_txt
+)
 
 # ---------------- LOAD ENV VARIABLES ----------------
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = os.getenv("INDEX_NAME", "studybuddy")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
-PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
 DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "400"))
 
 if not GEMINI_API_KEY:
     raise ValueError("❌ GEMINI_API_KEY not found!")
-if not PINECONE_API_KEY:
-    raise ValueError("❌ PINECONE_API_KEY not found!")
 
-# ---------------- CONFIGURE GEMINI & PINECONE ----------------
+# ---------------- CONFIGURE GEMINI & VECTOR STORE ----------------
 client = genai.Client(api_key=GEMINI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-existing_indexes = [i.name for i in pc.list_indexes()]
-if INDEX_NAME not in existing_indexes:
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=768,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region=PINECONE_REGION)
-    )
-index = pc.Index(INDEX_NAME)
+index = get_vector_store()
 
 # ---------------- TIMEZONE SUPPORT ----------------
 try:
@@ -91,100 +93,296 @@ def get_relative_time(timestamp, timezone_str=None):
         return f"{int(diff / 86400)} days ago"
     return format_timestamp_to_local(timestamp, timezone_str, "%b %d, %Y")
 
-# ---------------- FILE EXTRACTION HELPERS ----------------
-def extract_text_from_pdf(file_path):
-    text = ""
-    with fitz.open(file_path) as pdf:
-        for page in pdf:
-            text += page.get_text("text") + "\n"
-    return text.strip()
-
-def extract_text_from_docx(file_path):
-    return docx2txt.process(file_path).strip()
-
-def extract_text_from_txt(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        return f.read().strip()
-
-def extract_text(file_path):
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".pdf":
-        return extract_text_from_pdf(file_path)
-    elif ext == ".docx":
-        return extract_text_from_docx(file_path)
-    elif ext == ".txt":
-        return extract_text_from_txt(file_path)
-    else:
-        raise ValueError(f"Unsupported file format: {ext}")
-
-# ---------------- CHUNKING & EMBEDDINGS ----------------
-def chunk_text(text: str, max_chars: int = 800) -> List[str]:
-    text = text.strip()
-    if not text:
-        return []
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    chunks = []
-    current_chunk = ""
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) + 1 <= max_chars:
-            current_chunk += (" " + sentence) if current_chunk else sentence
+# ---------------- STREAMING NOTES INGESTION ----------------
+def document_id(document_name: str) -> str:
+    """Stable ID for a user's document, derived from its file name."""
+    return hashlib.sha256(document_name.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+class NotesBatcher:
+    """
+    Shared embed → upsert buffer for note chunks.
+    
+    Several documents (and threads) can add chunks to one batcher, so the
+    chunks of many small files are embedded and upserted together instead of
+    in one undersized request per file. Whichever caller fills the buffer
+    flushes it; the embed and upsert run outside the lock, so other threads
+    keep adding (and flushing) meanwhile.
+    
+    Failures are tracked per document: a document with any chunk that did
+    not land is reported by close(), and its after_flush callbacks (e.g.
+    recording the source hash) are skipped so a re-upload retries it.
+    """
+    
+    def __init__(self, batch_chunks: int = INGEST_BATCH_CHUNKS, on_progress=None):
+        self.batch_chunks = max(1, batch_chunks)
+        self.on_progress = on_progress
+        self.stored = 0
+        self._pending = []
+        self._finalizers = []
+        self._failed_documents = {}  # (user_id, doc_id) -> document name
+        self._failed_unnamed = 0
+        self._inflight = 0
+        self._lock = threading.Condition()
+    
+    def report(self, stage: str, count: int):
+        if self.on_progress and count:
+            self.on_progress(stage, count)
+    
+    def add(self, vector_id: str, chunk: str, metadata: Dict[str, Any], manifest_entry=None):
+        """
+        Queue one chunk; `manifest_entry` is (user_id, doc_id, document_name, chunk_hash).
+        
+        Raises once a chunk of the same document has failed, so the caller
+        stops reading a document that cannot be completed.
+        """
+        with self._lock:
+            self._pending.append((vector_id, chunk, metadata, manifest_entry))
+            batch = self._take_locked() if len(self._pending) >= self.batch_chunks else None
+        if batch:
+            self._flush_batch(batch)
+        document = manifest_entry[:2] if manifest_entry else None
+        with self._lock:
+            if document in self._failed_documents:
+                raise RuntimeError(f"{self._failed_documents[document]}: note vectors could not be embedded or upserted")
+    
+    def flush(self):
+        with self._lock:
+            batch = self._take_locked()
+        if batch and self._flush_batch(batch):
+            raise RuntimeError("note vectors could not be embedded or upserted")
+    
+    def after_flush(self, callback, document=None):
+        """Run `callback` after close(); with `document` = (user_id, doc_id), only if all its chunks landed."""
+        with self._lock:
+            self._finalizers.append((document, callback))
+    
+    def close(self):
+        """Flush what is left, run the after_flush callbacks, and raise if any chunk failed."""
+        with self._lock:
+            batch = self._take_locked()
+        if batch:
+            self._flush_batch(batch)
+        with self._lock:
+            # Flushes started by other threads must land before finalizing
+            while self._inflight:
+                self._lock.wait()
+            finalizers, self._finalizers = self._finalizers, []
+            failed = dict(self._failed_documents)
+            failed_unnamed = self._failed_unnamed
+        for document, callback in finalizers:
+            if document not in failed:
+                callback()
+        if failed or failed_unnamed:
+            names = sorted(failed.values()) + ([f"{failed_unnamed} unnamed chunks"] if failed_unnamed else [])
+            raise RuntimeError(f"note vectors could not be embedded or upserted for: {', '.join(names)}")
+    
+    def discard(self):
+        """Drop queued chunks and callbacks (used when a run is cancelled)."""
+        with self._lock:
+            self._pending, self._finalizers = [], []
+    
+    def _take_locked(self):
+        batch, self._pending = self._pending, []
+        if batch:
+            self._inflight += 1
+        return batch
+    
+    def _flush_batch(self, batch) -> int:
+        """Embed and upsert one batch taken with _take_locked; returns how many chunks failed."""
+        failed_ids = set()
+        try:
+            failed_ids = self._embed_and_upsert(batch)
+        except Exception as e:
+            print(f"[ERROR] NotesBatcher: batch of {len(batch)} chunks failed: {e}")
+            failed_ids = {vector_id for vector_id, _, _, _ in batch}
+        finally:
+            with self._lock:
+                for vector_id, _, _, entry in batch:
+                    if vector_id not in failed_ids:
+                        continue
+                    if entry:
+                        user_id, doc_id, document_name, _ = entry
+                        self._failed_documents[(user_id, doc_id)] = document_name
+                    else:
+                        self._failed_unnamed += 1
+                self._inflight -= 1
+                self._lock.notify_all()
+        return len(failed_ids)
+    
+    def _embed_and_upsert(self, batch):
+        embed_failed = set()
+        embeddings = embed_texts_concurrent([chunk for _, chunk, _, _ in batch], failed=embed_failed)
+        self.report("chunks_embedded", len(batch) - len(embed_failed))
+        # Chunks whose embedding failed are not stored with placeholder
+        # vectors: they would match any query, and the manifest would then
+        # skip the document on re-upload
+        failed_ids = {batch[i][0] for i in embed_failed}
+        vectors = [
+            {"id": vector_id, "values": to_pinecone(emb), "metadata": metadata}
+            for i, ((vector_id, _, metadata, _), emb) in enumerate(zip(batch, embeddings))
+            if i not in embed_failed
+        ]
+        # A shared batcher can hold several users' chunks; each goes to its owner's namespace
+        upserted = 0
+        for namespace, group in group_by_namespace(vectors, record_namespace).items():
+            result = upsert_vectors(index, group, namespace=namespace,
+                                    on_batch=lambda count: self.report("vectors_upserted", count))
+            failed_ids.update(result["failed_ids"])
+            upserted += result["upserted"]
+        landed = [vector for vector in vectors if vector["id"] not in failed_ids]
+        notes_hot_tier.apply_upsert(landed)
+        keyword_index.add(landed)
+        
+        # Only chunks that actually landed go into the manifest, so a failed
+        # batch is embedded and upserted again on the next upload
+        manifest_updates = {}
+        for vector_id, _, _, entry in batch:
+            if entry and vector_id not in failed_ids:
+                user_id, doc_id, document_name, chunk_hash = entry
+                manifest_updates.setdefault((user_id, doc_id, document_name), []).append(chunk_hash)
+        for (user_id, doc_id, document_name), hashes in manifest_updates.items():
+            document_manifest.add_chunks(user_id, doc_id, hashes, document_name)
+        
+        with self._lock:
+            self.stored += upserted
+        return failed_ids
+
+def store_notes_stream(user_id: str, pages, user_timezone=None, timestamp=None,
+                       batch_chunks: int = INGEST_BATCH_CHUNKS, document_name: str = None,
+                       source_hash: str = None, on_progress=None, should_cancel=None,
+                       batcher: NotesBatcher = None) -> int:
+    """
+    Chunk, embed and upsert a document page by page.
+    
+    `pages` is any iterable of page texts (e.g. iter_document_pages). Chunks
+    are collected into batches of `batch_chunks`; each batch is embedded and
+    upserted before more pages are read, so memory stays bounded by the batch
+    and the first vectors land before the last page is parsed.
+    
+    When `document_name` is given, chunk IDs are derived from the document
+    and each chunk's content hash, and the document manifest is consulted:
+    chunks already stored are skipped, and chunks that no longer appear in the
+    document are deleted once the stream ends. `source_hash` (sha256 of the
+    uploaded bytes) is recorded so identical re-uploads can be skipped.
+    
+    `on_progress(stage, count)` is called with increments for the stages
+    "chunks_embedded", "chunks_unchanged" and "vectors_upserted".
+    `should_cancel()` is polled between chunks; a cancelled run keeps what
+    was already upserted and skips the deletion of removed chunks.
+    
+    Pass a shared `batcher` to merge several documents into the same embed
+    and upsert batches; the caller then owns it and must close() it, and the
+    source hash is only recorded after that final flush, provided every
+    chunk of the document landed.
+    
+    Returns the number of new or changed chunks queued (all of them upserted
+    unless a shared batcher is still open).
+    """
+    timestamp = timestamp or time.time()
+    local_time_info = {}
+    if user_timezone and TIMEZONE_AVAILABLE:
+        local_time_info = {
+            "local_time": format_timestamp_to_local(timestamp, user_timezone),
+            "relative_time": get_relative_time(timestamp, user_timezone),
+            "user_timezone": user_timezone
+        }
+    
+    doc_id = document_id(document_name) if document_name else None
+    known_hashes = document_manifest.get_chunks(user_id, doc_id) if doc_id else set()
+    seen_hashes = set()
+    
+    def vector_id(chunk_index: int, chunk_hash: str) -> str:
+        if doc_id:
+            return f"{user_id}_notes_{doc_id}_{chunk_hash[:16]}"
+        return f"{user_id}_notes_{chunk_hash[:16]}"
+    
+    shared = batcher is not None
+    if not shared:
+        batcher = NotesBatcher(batch_chunks, on_progress)
+    queued = 0
+    
+    cancelled = False
+    for i, chunk in enumerate(iter_chunks(iter_sentences(pages))):
+        if should_cancel and should_cancel():
+            cancelled = True
+            break
+        chunk_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+        if chunk_hash in seen_hashes:
+            continue
+        seen_hashes.add(chunk_hash)
+        if chunk_hash in known_hashes:
+            if on_progress:
+                on_progress("chunks_unchanged", 1)
+            continue
+        metadata = {
+            "type": "notes", 
+            "text": chunk, 
+            "user_id": user_id, 
+            "chunk_index": i,
+            "timestamp": timestamp,
+            "source": "uploaded_notes",
+            **local_time_info
+        }
+        if doc_id:
+            metadata["doc_id"] = doc_id
+            metadata["document_name"] = document_name
+        batcher.add(vector_id(i, chunk_hash), chunk, metadata,
+                    (user_id, doc_id, document_name, chunk_hash) if doc_id else None)
+        queued += 1
+    
+    if cancelled:
+        if not shared:
+            batcher.discard()
+        print(f"[INFO] Ingestion cancelled after {batcher.stored} vectors for user {user_id}")
+        return queued
+    if not shared:
+        batcher.close()
+    
+    removed = known_hashes - seen_hashes
+    if removed:
+        removed_ids = [vector_id(0, h) for h in removed]
+        for i in range(0, len(removed_ids), 100):
+            index.delete(ids=removed_ids[i:i+100], namespace=user_namespace(user_id))
+        notes_hot_tier.apply_delete(user_id, removed_ids)
+        keyword_index.remove(user_id, removed_ids)
+        document_manifest.remove_chunks(user_id, doc_id, removed)
+    
+    if doc_id and source_hash:
+        if shared:
+            batcher.after_flush(lambda: document_manifest.set_source_hash(user_id, doc_id, source_hash),
+                                document=(user_id, doc_id))
         else:
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = sentence
-    if current_chunk:
-        chunks.append(current_chunk)
-    return chunks
-
-def embed_text(text: str):
+            document_manifest.set_source_hash(user_id, doc_id, source_hash)
+    
+    if doc_id:
+        print(f"[INFO] {document_name}: {queued} new/changed chunks stored, "
+              f"{len(seen_hashes) - queued} unchanged, {len(removed)} removed for user {user_id}")
+    elif queued:
+        print(f"[INFO] Stored {queued} note vectors for user {user_id}")
+    return queued
+
+def store_notes_from_file(user_id: str, file_path: str, user_timezone=None, document_name: str = None) -> bool:
+    """Stream a PDF/DOCX/TXT file straight into the knowledge base."""
     try:
-        if not text or not text.strip():
-            return [random.uniform(0.01, 0.02) for _ in range(768)]
-        
-        text = text.strip()[:10000]
-        result = client.models.embed_content(
-            model="gemini-embedding-2",
-            contents=[text],
-            config=types.EmbedContentConfig(output_dimensionality=768)
-        )
-        
-        emb = None
-        if result and result.embeddings and len(result.embeddings) > 0:
-            emb = result.embeddings[0].values if hasattr(result.embeddings[0], 'values') else list(result.embeddings[0])
-        
-        if emb is None:
-            return [random.uniform(0.01, 0.02) for _ in range(768)]
-        
-        if len(emb) != 768:
-            emb = emb[:768] if len(emb) > 768 else emb + [random.uniform(0.001, 0.002) for _ in range(768 - len(emb))]
-        
-        if all(abs(v) < 0.0001 for v in emb):
-            emb = [v + (random.random() * 0.0001 - 0.00005) for v in emb]
-        
-        return emb
+        document_name = document_name or os.path.basename(file_path)
+        store_notes_stream(user_id, iter_document_pages(file_path), user_timezone,
+                           document_name=document_name)
+        return True
     except Exception as e:
-        print(f"[ERROR] embed_text: {e}")
-        return [random.uniform(0.01, 0.02) for _ in range(768)]
-
-# ---------------- DUPLICATE PREVENTION CACHE ----------------
-_storage_cache = {}
-_cache_expiry = 300
-
-def get_cache_key(user_id: str, item_type: str, hash_value: str) -> str:
-    return f"{user_id}:{item_type}:{hash_value}"
+        print(f"[ERROR] store_notes_from_file: {e}")
+        return False
 
-def is_duplicate(user_id: str, item_type: str, hash_value: str) -> bool:
-    cache_key = get_cache_key(user_id, item_type, hash_value)
-    if cache_key in _storage_cache:
-        return time.time() - _storage_cache[cache_key] < _cache_expiry
-    return False
+# ---------------- STORE NOTES & QUIZZES ----------------
+def _write_quizzes(records: List[Dict[str, Any]]):
+    # Quizzes are only fetched by metadata filter, never searched
+    # semantically, so they get a hash-derived vector instead of an
+    # embedding call
+    write_records(index, records, lambda texts: [placeholder_vector(t) for t in texts], namespace=record_namespace)
 
-def mark_stored(user_id: str, item_type: str, hash_value: str):
-    _storage_cache[get_cache_key(user_id, item_type, hash_value)] = time.time()
+quiz_queue = DurableQueue("quiz", _write_quizzes)
 
-# ---------------- STORE NOTES & QUIZZES ----------------
-def store_notes_and_quizzes(user_id: str, notes_text=None, quiz_data=None, user_timezone=None):
-    vectors = []
+def store_notes_and_quizzes(user_id: str, notes_text=None, quiz_data=None, user_timezone=None,
+                            document_name: str = None, source_hash: str = None):
     timestamp = time.time()
     
     try:
@@ -196,57 +394,45 @@ def store_notes_and_quizzes(user_id: str, notes_text=None, quiz_data=None, user_
                 "user_timezone": user_timezone
             }
         
+        notes_stored = 0
+        if notes_text:
+            # Page-like sections, so an edit to pasted notes only re-embeds its own section
+            notes_stored = store_notes_stream(user_id, iter_text_sections(notes_text), user_timezone, timestamp,
+                                              document_name=document_name, source_hash=source_hash)
+        
         if quiz_data:
             quiz_copy = quiz_data.copy()
             quiz_copy.pop('timestamp', None)
             quiz_copy.pop('difficulty_config', None)
             content_hash = hashlib.md5(json.dumps(quiz_copy, sort_keys=True).encode()).hexdigest()
-            
-            if is_duplicate(user_id, "quiz", content_hash):
-                print(f"[INFO] Duplicate quiz detected for user {user_id}, skipping storage")
-                return True
-            mark_stored(user_id, "quiz", content_hash)
-        
-        if notes_text:
-            chunks = chunk_text(notes_text)
-            for i, chunk in enumerate(chunks):
-                metadata = {
-                    "type": "notes", 
-                    "text": chunk, 
-                    "user_id": user_id, 
-                    "chunk_index": i,
-                    "timestamp": timestamp,
-                    "source": "uploaded_notes",
-                    **local_time_info
-                }
-                vectors.append({
-                    "id": f"{user_id}_notes_{int(timestamp)}_{i}",
-                    "values": embed_text(chunk),
-                    "metadata": metadata
-                })
-        
-        if quiz_data:
-            quiz_json = json.dumps(quiz_data)
+            # Deterministic ID: the same quiz stored twice is one idempotent
+            # write, skipped by the flusher's existence check
+            vector_id = f"{user_id}_quiz_{content_hash[:16]}"
             metadata = {
                 "type": "quiz", 
-                "quiz_data": quiz_json, 
                 "user_id": user_id,
                 "timestamp": timestamp,
                 "source": "generated_quiz",
+                "topic": quiz_data.get("topic", "Unknown"),
+                "difficulty": quiz_data.get("difficulty", "medium"),
+                "question_count": len(quiz_data.get("quiz", [])),
                 **local_time_info
             }
-            vectors.append({
-                "id": f"{user_id}_quiz_{int(timestamp)}_{random.randint(1000, 9999)}",
-                "values": embed_text(quiz_json),
+            # The full quiz lives in the local document store; Pinecone
+            # only keeps the fields above
+            if document_store.put(vector_id, user_id, "quiz", quiz_data):
+                metadata["payload_key"] = vector_id
+            else:
+                metadata["quiz_data"] = json.dumps(quiz_data)
+            # Logged to the WAL and acknowledged right away; the upsert
+            # happens in the background and is replayed on failure
+            quiz_queue.put({
+                "id": vector_id,
+                "text": vector_id,
                 "metadata": metadata
             })
-        
-        if vectors:
-            for i in range(0, len(vectors), 100):
-                index.upsert(vectors=vectors[i:i+100])
-            print(f"[INFO] Stored {len(vectors)} vectors for user {user_id}")
-            return True
-        return False
+            print(f"[INFO] Queued quiz for user {user_id}")
+        return bool(quiz_data) or notes_stored > 0 or bool(notes_text and document_name)
     except Exception as e:
         print(f"[ERROR] store_notes_and_quizzes: {e}")
         return False
@@ -758,12 +944,7 @@ def evaluate_quiz_attempt(quiz_json, student_answers, user_id=None, user_timezon
                 print(f"[WARNING] Failed to store progress for user {user_id}")
                 
         except ImportError as e:
-            print(f"[WARNING] Progress module not found: {e}")
-            # Try direct storage as fallback
-            try:
-                store_progress_direct(user_id, progress_data, user_timezone)
-            except Exception as e2:
-                print(f"[ERROR] Direct storage failed: {e2}")
+            print(f"[WARNING] Progress module not found, progress not stored: {e}")
                 
         except Exception as e:
             print(f"[ERROR] Failed to store progress: {e}")
@@ -773,79 +954,10 @@ def evaluate_quiz_attempt(quiz_json, student_answers, user_id=None, user_timezon
     return progress_data
 
 
-# ---------------- DIRECT PROGRESS STORAGE (FALLBACK) ----------------
-def store_progress_direct(user_id: str, progress_data: Dict[str, Any], user_timezone=None) -> bool:
-    """
-    Direct storage of progress data to Pinecone (fallback if Progress module is not available).
-    """
-    try:
-        timestamp = time.time()
-        
-        # Create a stable hash for duplicate detection
-        progress_copy = progress_data.copy()
-        progress_copy.pop('timestamp', None)
-        progress_hash = hashlib.md5(json.dumps(progress_copy, sort_keys=True).encode()).hexdigest()
-        
-        # Check for duplicate in cache
-        if is_duplicate(user_id, "progress", progress_hash):
-            print(f"[INFO] Duplicate progress detected for user {user_id}, skipping storage")
-            return True
-        
-        mark_stored(user_id, "progress", progress_hash)
-        
-        # Prepare local time info
-        local_time_info = {}
-        if user_timezone and TIMEZONE_AVAILABLE:
-            local_time_info = {
-                "local_time": format_timestamp_to_local(timestamp, user_timezone),
-                "relative_time": get_relative_time(timestamp, user_timezone),
-                "user_timezone": user_timezone
-            }
-        
-        progress_json = json.dumps(progress_data)
-        metadata = {
-            "type": "progress",
-            "progress_data": progress_json,
-            "user_id": user_id,
-            "timestamp": timestamp,
-            "source": "quiz_result",
-            "progress_hash": progress_hash,
-            **local_time_info
-        }
-        
-        # Generate embedding
-        emb = embed_text(progress_json)
-        
-        # Ensure embedding has correct dimensions
-        if len(emb) != 768:
-            print(f"[WARNING] Embedding length {len(emb)} != 768, adjusting")
-            if len(emb) < 768:
-                emb = emb + [random.uniform(0.001, 0.002) for _ in range(768 - len(emb))]
-            else:
-                emb = emb[:768]
-        
-        # Create vector
-        vector = {
-            "id": f"{user_id}_progress_{int(timestamp)}_{progress_hash[:8]}",
-            "values": emb,
-            "metadata": metadata
-        }
-        
-        # Upsert to Pinecone
-        index.upsert(vectors=[vector])
-        print(f"[INFO] Direct storage: Progress vector stored for user {user_id}")
-        return True
-        
-    except Exception as e:
-        print(f"[ERROR] Direct storage failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-
-
 # ---------------- STORE PROGRESS (WRAPPER FOR BACKWARD COMPATIBILITY) ----------------
 def store_progress(user_id: str, progress_data: Dict[str, Any], user_timezone=None) -> bool:
     """
-    Wrapper function to store progress. This function is called from the Progress module.
+    Wrapper function to store progress; delegates to the Progress module.
     """
-    return store_progress_direct(user_id, progress_data, user_timezone)
\ No newline at end of file
+    from Progress import store_progress as store_progress_data
+    return store_progress_data(user_id=user_id, progress_data=progress_data, user_timezone=user_timezone)
\ No newline at end of file
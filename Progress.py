@@ -6,26 +6,18 @@ import hashlib
 from datetime import datetime
 from typing import List, Dict, Any
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
+from Embeddings import placeholder_vector, to_pinecone
+from Upsert_Engine import write_records
+from Write_Ahead_Log import DurableQueue
+from Document_Store import document_store
+from Vector_Store import get_vector_store, record_namespace, user_namespace
 
 # ---------------- LOAD ENV VARIABLES ----------------
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = os.getenv("INDEX_NAME", "studybuddy")
-PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
 DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
 
-if not PINECONE_API_KEY:
-    raise ValueError("❌ PINECONE_API_KEY not found!")
-
-# ---------------- CONFIGURE PINECONE ----------------
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-existing_indexes = [i.name for i in pc.list_indexes()]
-if INDEX_NAME not in existing_indexes:
-    raise ValueError(f"❌ Index '{INDEX_NAME}' does not exist. Please run notes_quiz.py first.")
-
-index = pc.Index(INDEX_NAME)
+# ---------------- CONFIGURE VECTOR STORE ----------------
+index = get_vector_store()
 
 # ---------------- TIMEZONE SUPPORT ----------------
 try:
@@ -69,64 +61,54 @@ def get_relative_time(timestamp, timezone_str=None):
         return f"{int(diff / 86400)} days ago"
     return format_timestamp_to_local(timestamp, timezone_str, "%b %d, %Y")
 
-# ---------------- EMBEDDING FUNCTION ----------------
-def embed_text(text: str):
-    """Simple embedding function for Pinecone queries."""
-    try:
-        if not text or not text.strip():
-            return [random.uniform(0.01, 0.02) for _ in range(768)]
-        
-        # For progress, we just need a consistent vector for filtering
-        # Use a hash-based deterministic vector
-        import hashlib
-        hash_obj = hashlib.sha256(text.encode())
-        hash_bytes = hash_obj.digest()
-        
-        # Convert hash to vector
-        vector = []
-        for i in range(768):
-            byte_val = hash_bytes[i % len(hash_bytes)]
-            vector.append((byte_val / 255.0) * 0.02 + 0.01)
-        
-        return vector
-    except:
-        return [random.uniform(0.01, 0.02) for _ in range(768)]
+# ---------------- PROGRESS WRITES ----------------
+def _placeholder_vectors(texts: List[str]) -> list:
+    # Progress is only looked up by metadata filter, so a hash-derived
+    # vector is enough
+    return [placeholder_vector(text) for text in texts]
 
-# ---------------- DUPLICATE PREVENTION CACHE ----------------
-_progress_cache = {}
-_cache_expiry = 300  # 5 minutes
+def _write_progress(records: List[Dict[str, Any]]):
+    write_records(index, records, _placeholder_vectors, namespace=record_namespace)
 
-def get_cache_key(user_id: str, hash_value: str) -> str:
-    return f"{user_id}:{hash_value}"
+progress_queue = DurableQueue("progress", _write_progress)
 
-def is_duplicate_progress(user_id: str, hash_value: str) -> bool:
-    cache_key = get_cache_key(user_id, hash_value)
-    if cache_key in _progress_cache:
-        return time.time() - _progress_cache[cache_key] < _cache_expiry
-    return False
+# ---------------- STORE PROGRESS ----------------
+# Results without an attempt id or evaluation timestamp are deduplicated
+# within this window instead
+PROGRESS_DEDUPE_WINDOW = 300  # seconds
 
-def mark_progress_stored(user_id: str, hash_value: str):
-    _progress_cache[get_cache_key(user_id, hash_value)] = time.time()
+def attempt_key(progress_data: Dict[str, Any], now: float) -> str:
+    """Identifies one quiz attempt: its attempt_id, evaluation timestamp, or the current time window."""
+    if progress_data.get("attempt_id"):
+        return str(progress_data["attempt_id"])
+    if progress_data.get("timestamp"):
+        return repr(progress_data["timestamp"])
+    return f"window-{int(now // PROGRESS_DEDUPE_WINDOW)}"
+
+SUMMARY_FIELDS = ("score", "adjusted_score", "total", "accuracy", "difficulty", "topic")
+
+def summary_fields(progress_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Small, filterable fields of a progress record that are kept in Pinecone metadata."""
+    fields = {k: progress_data[k] for k in SUMMARY_FIELDS if progress_data.get(k) is not None}
+    # The quiz source ("notes", "topic", ...) is stored apart from the record source
+    if progress_data.get("source"):
+        fields["quiz_source"] = progress_data["source"]
+    return fields
 
-# ---------------- STORE PROGRESS ----------------
 def store_progress(user_id: str, progress_data: Dict[str, Any], user_timezone=None) -> bool:
     """
-    Store quiz progress results with duplicate prevention.
+    Store quiz progress results; duplicates collapse onto one content-hash ID.
     """
     try:
         timestamp = time.time()
         
-        # Create a stable hash for duplicate detection (remove timestamp)
-        progress_copy = progress_data.copy()
-        progress_copy.pop('timestamp', None)
-        progress_hash = hashlib.md5(json.dumps(progress_copy, sort_keys=True).encode()).hexdigest()
-        
-        # Check for duplicate
-        if is_duplicate_progress(user_id, progress_hash):
-            print(f"[INFO] Duplicate progress detected for user {user_id}, skipping storage")
-            return True
-        
-        mark_progress_stored(user_id, progress_hash)
+        # Hash the result together with its attempt (the evaluation
+        # timestamp), so a retake with identical answers is a new record
+        # while saving the same evaluation twice is not
+        progress_hash = hashlib.md5(json.dumps(
+            {"attempt": attempt_key(progress_data, timestamp), "result": progress_data},
+            sort_keys=True, default=str
+        ).encode()).hexdigest()
         
         # Prepare local time info
         local_time_info = {}
@@ -137,26 +119,33 @@ def store_progress(user_id: str, progress_data: Dict[str, Any], user_timezone=No
                 "user_timezone": user_timezone
             }
         
-        progress_json = json.dumps(progress_data)
+        # Deterministic ID: storing the same attempt again is an idempotent
+        # write that the flusher skips after an existence check
+        vector_id = f"{user_id}_progress_{progress_hash[:16]}"
         metadata = {
             "type": "progress",
-            "progress_data": progress_json,
             "user_id": user_id,
             "timestamp": timestamp,
             "source": "quiz_result",
             "progress_hash": progress_hash,
+            **summary_fields(progress_data),
             **local_time_info
         }
+        # The full record (per-question feedback) lives in the local
+        # document store; Pinecone only keeps the summary fields
+        if document_store.put(vector_id, user_id, "progress", progress_data):
+            metadata["payload_key"] = vector_id
+        else:
+            metadata["progress_data"] = json.dumps(progress_data)
         
-        emb = embed_text(progress_json)
-        vector = {
-            "id": f"{user_id}_progress_{int(timestamp)}_{progress_hash[:8]}",
-            "values": emb,
+        # Logged to the WAL and acknowledged right away; the upsert happens
+        # in the background and is replayed if Pinecone is unavailable
+        progress_queue.put({
+            "id": vector_id,
+            "text": vector_id,
             "metadata": metadata
-        }
-        
-        index.upsert(vectors=[vector])
-        print(f"[INFO] Stored progress for user {user_id}")
+        })
+        print(f"[INFO] Queued progress for user {user_id}")
         return True
         
     except Exception as e:
@@ -164,10 +153,39 @@ def store_progress(user_id: str, progress_data: Dict[str, Any], user_timezone=No
         return False
 
 # ---------------- FETCH PROGRESS ----------------
+def _progress_entry(vector_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary row for one progress vector; details stay in the document store."""
+    if "progress_data" in meta:
+        # Records written before the document store carry the full JSON
+        return json.loads(meta["progress_data"])
+    entry = {k: meta[k] for k in SUMMARY_FIELDS if k in meta}
+    entry["timestamp"] = meta.get("timestamp", 0)
+    entry["source"] = meta.get("quiz_source", "unknown")
+    entry["payload_key"] = meta.get("payload_key", vector_id)
+    return entry
+
+def load_progress_details(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fill in the full records (feedback etc.) for the given summary rows.
+
+    Only call this for rows that are actually displayed; it is a single
+    local lookup for all of them. Rows are updated in place and returned.
+    """
+    payloads = document_store.get_many(e["payload_key"] for e in entries if e.get("payload_key"))
+    for entry in entries:
+        payload = payloads.get(entry.get("payload_key"))
+        if payload:
+            for key, value in payload.items():
+                entry.setdefault(key, value)
+    return entries
+
 def fetch_progress_from_pinecone(user_id: str, user_timezone=None):
     """
     Fetch and summarize user progress.
     
+    Entries only hold the summary fields kept in Pinecone; pass the ones
+    you display to load_progress_details for per-question feedback.
+    
     Returns:
         dict: {
             "user_id": user_id,
@@ -183,20 +201,21 @@ def fetch_progress_from_pinecone(user_id: str, user_timezone=None):
     """
     try:
         # Query for progress entries
-        query_vector = [random.uniform(0.01, 0.02) for _ in range(768)]
+        query_vector = to_pinecone(placeholder_vector(user_id))
         
         results = index.query(
             vector=query_vector,
             filter={"user_id": {"$eq": user_id}, "type": {"$eq": "progress"}}, 
             top_k=100, 
-            include_metadata=True
+            include_metadata=True,
+            namespace=user_namespace(user_id)
         )
         
         progress_list = []
         for match in getattr(results, "matches", []):
             meta = match.metadata or {}
             try:
-                data = json.loads(meta.get("progress_data", "{}"))
+                data = _progress_entry(match.id, meta)
                 if data and isinstance(data, dict):
                     timestamp = data.get('timestamp', 0)
                     if timestamp:
@@ -272,70 +291,6 @@ def fetch_progress_from_pinecone(user_id: str, user_timezone=None):
             }
         }
 
-# ---------------- CLEANUP DUPLICATE PROGRESS ----------------
-def cleanup_duplicate_progress(user_id: str):
-    """
-    Clean up duplicate progress entries for a user.
-    Keeps only the most recent entry for each unique progress result.
-    """
-    try:
-        query_vector = [random.uniform(0.01, 0.02) for _ in range(768)]
-        
-        results = index.query(
-            vector=query_vector,
-            filter={"user_id": {"$eq": user_id}, "type": {"$eq": "progress"}}, 
-            top_k=200, 
-            include_metadata=True
-        )
-        
-        # Group by content hash
-        hash_map = {}
-        to_delete = []
-        
-        for match in getattr(results, "matches", []):
-            meta = match.metadata or {}
-            try:
-                data = json.loads(meta.get("progress_data", "{}"))
-                # Create a stable key without timestamp
-                data_copy = data.copy()
-                data_copy.pop('timestamp', None)
-                data_copy.pop('local_time', None)
-                data_copy.pop('relative_time', None)
-                
-                content_hash = hashlib.md5(json.dumps(data_copy, sort_keys=True).encode()).hexdigest()
-                
-                if content_hash not in hash_map:
-                    hash_map[content_hash] = []
-                hash_map[content_hash].append({
-                    'id': match.id,
-                    'timestamp': meta.get('timestamp', 0)
-                })
-            except Exception as e:
-                print(f"[WARNING] Error parsing: {e}")
-                continue
-        
-        # Keep only the most recent for each hash
-        for hash_val, items in hash_map.items():
-            if len(items) > 1:
-                # Sort by timestamp (newest first)
-                items.sort(key=lambda x: x['timestamp'], reverse=True)
-                # Keep first (newest), delete rest
-                to_delete.extend([item['id'] for item in items[1:]])
-        
-        if to_delete:
-            print(f"[INFO] Deleting {len(to_delete)} duplicate progress entries for user {user_id}")
-            for i in range(0, len(to_delete), 100):
-                batch = to_delete[i:i+100]
-                index.delete(ids=batch)
-            return len(to_delete)
-        
-        print(f"[INFO] No duplicate progress entries found for user {user_id}")
-        return 0
-        
-    except Exception as e:
-        print(f"[ERROR] cleanup_duplicate_progress: {e}")
-        return 0
-
 # ---------------- FORMAT PROGRESS FOR DISPLAY ----------------
 def format_progress_for_display(progress_data: Dict[str, Any]) -> str:
     """Format progress data for nice UI display."""
@@ -0,0 +1,86 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from dotenv import load_dotenv
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "128"))  # entries per user
+RETRIEVAL_CACHE_MAX_USERS = int(os.getenv("RETRIEVAL_CACHE_MAX_USERS", "256"))
+# Upper bound on how long a result is reused; covers writes the remote index
+# had not made queryable yet when the result was computed
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))  # seconds
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+# ---------------- RETRIEVAL CACHE ----------------
+class RetrievalCache:
+    """
+    Per-user LRU of retrieval results.
+
+    Keys are built by the caller and must include everything the result
+    depends on, in particular the user's knowledge-base version: a write
+    bumps the version, so older entries are no longer looked up and age out
+    of the LRU instead of being invalidated one by one. The version is
+    bumped when a write returns, which can be before the remote index
+    serves it, so entries also expire after `ttl` seconds.
+    """
+
+    def __init__(self, size: int = RETRIEVAL_CACHE_SIZE, max_users: int = RETRIEVAL_CACHE_MAX_USERS,
+                 ttl: float = RETRIEVAL_CACHE_TTL):
+        self.size = max(1, size)
+        self.max_users = max(1, max_users)
+        self.ttl = ttl
+        self._users: "OrderedDict[str, OrderedDict[Hashable, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is None or key not in entries:
+                self.misses += 1
+                return None
+            created_at, value = entries[key]
+            if time.time() - created_at > self.ttl:
+                del entries[key]
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, user_id: str, key: Hashable, value: Any):
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is None:
+                entries = self._users[user_id] = OrderedDict()
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_id)
+            entries[key] = (time.time(), value)
+            entries.move_to_end(key)
+            while len(entries) > self.size:
+                entries.popitem(last=False)
+
+    def clear(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._users),
+                "entries": sum(len(entries) for entries in self._users.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+retrieval_cache = RetrievalCache()
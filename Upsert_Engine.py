@@ -0,0 +1,181 @@
+import os
+import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+from dotenv import load_dotenv
+from Embeddings import is_retryable, backoff_delay, to_pinecone
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+# Pinecone rejects upsert requests over 2 MB or 1000 records; stay a little
+# under the byte limit to leave room for the request envelope.
+UPSERT_MAX_BYTES = int(os.getenv("UPSERT_MAX_BYTES", str(1_900_000)))
+UPSERT_MAX_RECORDS = int(os.getenv("UPSERT_MAX_RECORDS", "1000"))
+UPSERT_MAX_CONCURRENCY = int(os.getenv("UPSERT_MAX_CONCURRENCY", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "3"))
+
+# ---------------- BATCH PACKING ----------------
+def record_size(record: Dict[str, Any]) -> int:
+    """Serialized size of one upsert record in bytes (compact JSON, as sent over REST)."""
+    return len(json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+def pack_batches(records: List[Dict[str, Any]], max_bytes: int = UPSERT_MAX_BYTES,
+                 max_records: int = UPSERT_MAX_RECORDS) -> List[List[Dict[str, Any]]]:
+    """
+    Greedily split records into batches under both the byte and record limits.
+
+    Records keep their order. A record that is larger than `max_bytes` on its
+    own still gets a batch of its own, so Pinecone reports the error for it.
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    batch: List[Dict[str, Any]] = []
+    batch_bytes = 0
+    for record in records:
+        size = record_size(record) + 1  # separating comma
+        if batch and (batch_bytes + size > max_bytes or len(batch) >= max_records):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(record)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+# ---------------- PARALLEL UPSERT ----------------
+# Shared by every caller so concurrent ingestions cannot multiply the number
+# of in-flight requests against the index.
+_executor = ThreadPoolExecutor(max_workers=max(1, UPSERT_MAX_CONCURRENCY), thread_name_prefix="upsert")
+
+def _submit(fn, batch, inline: bool = False) -> Future:
+    # A lone batch, or a call made while the interpreter is shutting down
+    # (e.g. a write-behind drain from atexit), runs on the calling thread
+    if not inline:
+        try:
+            return _executor.submit(fn, batch)
+        except RuntimeError:
+            pass
+    future = Future()
+    try:
+        future.set_result(fn(batch))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def upsert_vectors(index, records: List[Dict[str, Any]], namespace: Optional[str] = None,
+                   max_bytes: int = UPSERT_MAX_BYTES, max_records: int = UPSERT_MAX_RECORDS,
+                   max_retries: int = UPSERT_MAX_RETRIES,
+                   on_batch: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Upsert records in size-aware batches sent concurrently on the shared pool.
+
+    Only the batches that failed with a retryable error (429, 5xx, dropped
+    connection) are sent again, after a jittered backoff, up to `max_retries`
+    rounds. `on_batch(count)` is called after each successful batch.
+
+    Returns stats: upserted, failed, failed_ids, batches, retries, seconds and
+    vectors_per_sec. Callers decide what to do with failed_ids.
+    """
+    started = time.perf_counter()
+    kwargs = {"namespace": namespace} if namespace else {}
+    pending = pack_batches(records, max_bytes, max_records)
+    batch_count = len(pending)
+    upserted, retries = 0, 0
+    failed: List[Dict[str, Any]] = []
+
+    def send(batch):
+        index.upsert(vectors=batch, **kwargs)
+        return len(batch)
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            retries += len(pending)
+            time.sleep(backoff_delay(attempt - 1))
+        futures = [(batch, _submit(send, batch, inline=len(pending) == 1)) for batch in pending]
+        pending = []
+        for batch, future in futures:
+            try:
+                count = future.result()
+            except Exception as e:
+                if attempt < max_retries and is_retryable(e):
+                    pending.append(batch)
+                else:
+                    print(f"[ERROR] upsert_vectors: batch of {len(batch)} failed: {e}")
+                    failed.extend(batch)
+                continue
+            upserted += count
+            if on_batch:
+                on_batch(count)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "upserted": upserted,
+        "failed": len(failed),
+        "failed_ids": [record["id"] for record in failed],
+        "batches": batch_count,
+        "retries": retries,
+        "seconds": round(elapsed, 3),
+        "vectors_per_sec": round(upserted / elapsed, 1) if elapsed > 0 else 0.0
+    }
+    if records:
+        print(f"[INFO] Upserted {upserted}/{len(records)} vectors in {batch_count} batches "
+              f"in {elapsed:.2f}s ({stats['vectors_per_sec']} vectors/sec, {retries} retried)")
+    return stats
+
+def existing_ids(index, ids: List[str], namespace: Optional[str] = None) -> Set[str]:
+    """IDs among `ids` that are already in the index (fetched in slices of 100)."""
+    kwargs = {"namespace": namespace} if namespace else {}
+    found: Set[str] = set()
+    for i in range(0, len(ids), 100):
+        result = index.fetch(ids=ids[i:i + 100], **kwargs)
+        found.update((getattr(result, "vectors", None) or {}).keys())
+    return found
+
+def group_by_namespace(records: List[Dict[str, Any]],
+                       namespace: Union[str, Callable[[Dict[str, Any]], Optional[str]], None]
+                       ) -> Dict[Optional[str], List[Dict[str, Any]]]:
+    """Split records by target namespace; `namespace` is a name or a function of the record."""
+    if not callable(namespace):
+        return {namespace: records} if records else {}
+    groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(namespace(record), []).append(record)
+    return groups
+
+def write_records(index, records: List[Dict[str, Any]], vectorize: Callable[[List[str]], Any],
+                  namespace: Union[str, Callable[[Dict[str, Any]], Optional[str]], None] = None,
+                  skip_existing: bool = True) -> int:
+    """
+    Upsert queued {"id", "text", "metadata"} records, vectorizing their text.
+
+    Used by the write-behind and replay paths: `vectorize(texts)` returns one
+    vector per text (embed_texts, or placeholder vectors for records that are
+    only read by filter). IDs are derived from content, so with
+    `skip_existing` records already in the index are dropped before anything
+    is embedded. `namespace` may be a function of the record (e.g.
+    record_namespace) to route a mixed batch to per-user namespaces. Raises
+    if any record could not be stored, so the write stays pending.
+    """
+    records = list({record["id"]: record for record in records}.values())
+    if skip_existing and records:
+        present: Set[str] = set()
+        for name, group in group_by_namespace(records, namespace).items():
+            present |= existing_ids(index, [record["id"] for record in group], name)
+        records = [record for record in records if record["id"] not in present]
+        if not records:
+            return 0
+    # One vectorize call for the whole batch, then one upsert per namespace
+    vectors = [
+        {"id": record["id"], "values": to_pinecone(values), "metadata": record["metadata"]}
+        for record, values in zip(records, vectorize([record["text"] for record in records]))
+    ]
+    upserted, failed = 0, 0
+    for name, group in group_by_namespace(vectors, namespace).items():
+        result = upsert_vectors(index, group, namespace=name)
+        upserted += result["upserted"]
+        failed += result["failed"]
+    if failed:
+        raise RuntimeError(f"{failed} of {len(vectors)} vectors could not be upserted")
+    return upserted
@@ -0,0 +1,463 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Sequence
+from dotenv import load_dotenv
+import numpy as np
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").strip().lower()  # "pinecone" or "local"
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+INDEX_NAME = os.getenv("INDEX_NAME", "studybuddy")
+PINECONE_REGION = os.getenv("PINECONE_REGION", os.getenv("PINECONE_ENVIRONMENT", "us-east-1"))
+VECTOR_DIM = 768
+# Directory for the local backend's snapshots; empty keeps it in memory only
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", os.path.join(".studybuddy", "vectors"))
+LOCAL_VECTOR_STORE_SAVE_INTERVAL = float(os.getenv("LOCAL_VECTOR_STORE_SAVE_INTERVAL", "5.0"))  # seconds
+# 0 gives every user a namespace of their own; N > 0 hashes users into N shared shards
+USER_NAMESPACE_SHARDS = int(os.getenv("USER_NAMESPACE_SHARDS", "0"))
+
+# ---------------- RESULT TYPES ----------------
+# Attribute-compatible with the Pinecone client's responses, so callers work
+# unchanged against either backend.
+
+@dataclass
+class Match:
+    id: str
+    score: float
+    metadata: Optional[Dict[str, Any]] = None
+    values: List[float] = field(default_factory=list)
+
+@dataclass
+class QueryResult:
+    matches: List[Match]
+    namespace: str = ""
+
+@dataclass
+class Vector:
+    id: str
+    values: List[float]
+    metadata: Optional[Dict[str, Any]] = None
+
+@dataclass
+class FetchResult:
+    vectors: Dict[str, Vector]
+    namespace: str = ""
+
+# ---------------- VECTOR STORE PROTOCOL ----------------
+class VectorStore(Protocol):
+    """The subset of the Pinecone index API the app relies on."""
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> Any: ...
+
+    def query(self, vector: Sequence[float], top_k: int = 10, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True, include_values: bool = False,
+              namespace: Optional[str] = None) -> Any: ...
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> Any: ...
+
+    def list(self, prefix: str = "", namespace: Optional[str] = None, limit: int = 100) -> Iterator[List[str]]: ...
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: Optional[str] = None,
+               delete_all: bool = False, filter: Optional[Dict[str, Any]] = None) -> Any: ...
+
+# ---------------- PINECONE BACKEND ----------------
+class PineconeVectorStore:
+    """Thin pass-through to a Pinecone serverless index (created on first use)."""
+
+    def __init__(self, index_name: str = INDEX_NAME, api_key: str = PINECONE_API_KEY,
+                 region: str = PINECONE_REGION, dimension: int = VECTOR_DIM):
+        from pinecone import Pinecone, ServerlessSpec
+        if not api_key:
+            raise ValueError("❌ PINECONE_API_KEY not found!")
+        pc = Pinecone(api_key=api_key)
+        existing_indexes = [i.name for i in pc.list_indexes()]
+        if index_name not in existing_indexes:
+            pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region=region)
+            )
+        self.index = pc.Index(index_name)
+
+    @staticmethod
+    def _ns(namespace: Optional[str]) -> Dict[str, str]:
+        return {"namespace": namespace} if namespace else {}
+
+    def upsert(self, vectors, namespace=None):
+        return self.index.upsert(vectors=vectors, **self._ns(namespace))
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True, include_values=False, namespace=None):
+        kwargs = {"filter": filter} if filter else {}
+        return self.index.query(vector=vector, top_k=top_k, include_metadata=include_metadata,
+                                include_values=include_values, **kwargs, **self._ns(namespace))
+
+    def fetch(self, ids, namespace=None):
+        return self.index.fetch(ids=ids, **self._ns(namespace))
+
+    def list(self, prefix="", namespace=None, limit=100):
+        return self.index.list(prefix=prefix, limit=limit, **self._ns(namespace))
+
+    def delete(self, ids=None, namespace=None, delete_all=False, filter=None):
+        if delete_all:
+            return self.index.delete(delete_all=True, **self._ns(namespace))
+        if filter:
+            return self.index.delete(filter=filter, **self._ns(namespace))
+        return self.index.delete(ids=ids, **self._ns(namespace))
+
+# ---------------- LOCAL NUMPY BACKEND ----------------
+_MISSING = object()
+
+class _Namespace:
+    """
+    One namespace of the local store.
+
+    Rows live in a preallocated float32 matrix of unit vectors (their
+    original norms are kept alongside for fetch), and metadata is columnar:
+    one object array per key, so filters become vectorized masks. Deletes
+    move the last row into the hole, keeping the arrays dense.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _grow(self, needed: int):
+        capacity = self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 64)
+        self.matrix = np.resize(self.matrix, (capacity, self.dim))
+        self.norms = np.resize(self.norms, capacity)
+        for key, column in self.columns.items():
+            grown = np.full(capacity, _MISSING, dtype=object)
+            grown[:len(column)] = column[:capacity]
+            self.columns[key] = grown
+
+    def _column(self, key: str) -> np.ndarray:
+        if key not in self.columns:
+            self.columns[key] = np.full(self.matrix.shape[0], _MISSING, dtype=object)
+        return self.columns[key]
+
+    def upsert(self, vector_id: str, values: np.ndarray, metadata: Dict[str, Any]):
+        row = self.rows.get(vector_id)
+        if row is None:
+            row = len(self.ids)
+            self._grow(row + 1)
+            self.ids.append(vector_id)
+            self.rows[vector_id] = row
+        norm = float(np.linalg.norm(values))
+        self.matrix[row] = values / norm if norm > 0 else values
+        self.norms[row] = norm
+        for column in self.columns.values():
+            column[row] = _MISSING
+        for key, value in (metadata or {}).items():
+            self._column(key)[row] = value
+
+    def delete(self, vector_id: str):
+        row = self.rows.pop(vector_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+            self.matrix[row] = self.matrix[last]
+            self.norms[row] = self.norms[last]
+            for column in self.columns.values():
+                column[row] = column[last]
+        self.ids.pop()
+        for column in self.columns.values():
+            column[last] = _MISSING
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        return {key: column[row] for key, column in self.columns.items() if column[row] is not _MISSING}
+
+    def values(self, row: int) -> List[float]:
+        return (self.matrix[row] * self.norms[row]).tolist()
+
+    # ---- filters ----
+    def mask(self, flt: Optional[Dict[str, Any]]) -> np.ndarray:
+        n = len(self.ids)
+        mask = np.ones(n, dtype=bool)
+        for key, condition in (flt or {}).items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self.mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(n, dtype=bool)
+                for sub in condition:
+                    any_mask |= self.mask(sub)
+                mask &= any_mask
+            else:
+                column = self.columns.get(key)
+                column = column[:n] if column is not None else np.full(n, _MISSING, dtype=object)
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for op, operand in condition.items():
+                    mask &= self._compare(column, op, operand)
+        return mask
+
+    @staticmethod
+    def _compare(column: np.ndarray, op: str, operand) -> np.ndarray:
+        present = column != _MISSING
+        if op == "$eq":
+            return present & (column == operand)
+        if op == "$ne":
+            return ~present | (column != operand)
+        if op in ("$in", "$nin"):
+            hit = np.zeros(len(column), dtype=bool)
+            for value in operand:
+                hit |= present & (column == value)
+            return hit if op == "$in" else ~hit
+        if op == "$exists":
+            return present if operand else ~present
+        compare = {
+            "$gt": lambda a: a > operand, "$gte": lambda a: a >= operand,
+            "$lt": lambda a: a < operand, "$lte": lambda a: a <= operand,
+        }.get(op)
+        if compare is None:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        return np.fromiter(
+            (v is not _MISSING and isinstance(v, (int, float)) and compare(v) for v in column),
+            dtype=bool, count=len(column)
+        )
+
+class LocalVectorStore:
+    """
+    In-process vector store: brute-force cosine top-k with NumPy.
+
+    Meant for single-node deployments, tests and benchmarks. When `path` is
+    set, each namespace is snapshotted to `<path>/<namespace>.npz` at most
+    every `save_interval` seconds after a write, and at exit.
+    """
+
+    def __init__(self, path: str = LOCAL_VECTOR_STORE_PATH, dimension: int = VECTOR_DIM,
+                 save_interval: float = LOCAL_VECTOR_STORE_SAVE_INTERVAL):
+        self.path = path
+        self.dimension = dimension
+        self.save_interval = save_interval
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._dirty = set()
+        self._last_save = time.monotonic()
+        self._lock = threading.RLock()
+        if path:
+            try:
+                os.makedirs(path, exist_ok=True)
+                self._load()
+            except Exception as e:
+                print(f"[WARNING] Local vector store persistence disabled ({path}): {e}")
+                self.path = ""
+            atexit.register(self.save)
+
+    def _ns(self, namespace: Optional[str]) -> _Namespace:
+        key = namespace or ""
+        if key not in self._namespaces:
+            self._namespaces[key] = _Namespace(self.dimension)
+        return self._namespaces[key]
+
+    def upsert(self, vectors, namespace=None):
+        with self._lock:
+            ns = self._ns(namespace)
+            for vector in vectors:
+                values = np.asarray(vector["values"], dtype=np.float32)
+                if values.shape != (self.dimension,):
+                    raise ValueError(f"Vector dimension {values.shape} does not match {self.dimension}")
+                ns.upsert(vector["id"], values, vector.get("metadata") or {})
+            self._mark_dirty(namespace)
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True, include_values=False, namespace=None):
+        query = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm > 0:
+            query = query / norm
+        with self._lock:
+            ns = self._namespaces.get(namespace or "")
+            if ns is None or not len(ns):
+                return QueryResult(matches=[], namespace=namespace or "")
+            if filter:
+                rows = np.flatnonzero(ns.mask(filter))
+                if not len(rows):
+                    return QueryResult(matches=[], namespace=namespace or "")
+                scores = ns.matrix[rows] @ query
+            else:
+                rows = np.arange(len(ns))
+                scores = ns.matrix[:len(ns)] @ query
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            matches = [
+                Match(
+                    id=ns.ids[rows[i]],
+                    score=float(scores[i]),
+                    metadata=ns.metadata(rows[i]) if include_metadata else None,
+                    values=ns.values(rows[i]) if include_values else []
+                )
+                for i in top
+            ]
+        return QueryResult(matches=matches, namespace=namespace or "")
+
+    def fetch(self, ids, namespace=None):
+        with self._lock:
+            ns = self._namespaces.get(namespace or "")
+            vectors = {}
+            for vector_id in ids:
+                row = ns.rows.get(vector_id) if ns else None
+                if row is not None:
+                    vectors[vector_id] = Vector(id=vector_id, values=ns.values(row), metadata=ns.metadata(row))
+        return FetchResult(vectors=vectors, namespace=namespace or "")
+
+    def list(self, prefix="", namespace=None, limit=100):
+        with self._lock:
+            ns = self._namespaces.get(namespace or "")
+            ids = sorted(i for i in (ns.ids if ns else []) if i.startswith(prefix))
+        for start in range(0, len(ids), max(1, limit)):
+            yield ids[start:start + limit]
+
+    def delete(self, ids=None, namespace=None, delete_all=False, filter=None):
+        with self._lock:
+            ns = self._namespaces.get(namespace or "")
+            if ns is None:
+                return {}
+            if delete_all:
+                self._namespaces[namespace or ""] = _Namespace(self.dimension)
+            else:
+                if filter:
+                    ids = [ns.ids[row] for row in np.flatnonzero(ns.mask(filter))]
+                for vector_id in ids or []:
+                    ns.delete(vector_id)
+            self._mark_dirty(namespace)
+        return {}
+
+    def describe_index_stats(self):
+        with self._lock:
+            return {
+                "dimension": self.dimension,
+                "namespaces": {name: {"vector_count": len(ns)} for name, ns in self._namespaces.items()},
+                "total_vector_count": sum(len(ns) for ns in self._namespaces.values())
+            }
+
+    # ---- persistence ----
+    def _file(self, namespace: str) -> str:
+        return os.path.join(self.path, f"{namespace or '__default__'}.npz")
+
+    def _mark_dirty(self, namespace: Optional[str]):
+        if not self.path:
+            return
+        self._dirty.add(namespace or "")
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Write snapshots of the namespaces changed since the last save."""
+        if not self.path:
+            return
+        with self._lock:
+            for name in list(self._dirty):
+                ns = self._namespaces.get(name) or _Namespace(self.dimension)
+                n = len(ns)
+                target = self._file(name)
+                tmp = target + ".tmp.npz"
+                try:
+                    np.savez(
+                        tmp,
+                        ids=np.array(ns.ids, dtype=str),
+                        matrix=ns.matrix[:n],
+                        norms=ns.norms[:n],
+                        metadata=np.array(json.dumps([ns.metadata(row) for row in range(n)]))
+                    )
+                    os.replace(tmp, target)
+                    self._dirty.discard(name)
+                except Exception as e:
+                    print(f"[WARNING] Local vector store save failed ({target}): {e}")
+            self._last_save = time.monotonic()
+
+    def _load(self):
+        for filename in os.listdir(self.path):
+            if not filename.endswith(".npz") or filename.endswith(".tmp.npz"):
+                continue
+            name = filename[:-4]
+            name = "" if name == "__default__" else name
+            with np.load(os.path.join(self.path, filename)) as data:
+                ids = data["ids"].tolist()
+                matrix, norms = data["matrix"], data["norms"]
+                metadata = json.loads(str(data["metadata"]))
+            ns = self._ns(name)
+            ns._grow(len(ids))
+            ns.matrix[:len(ids)] = matrix
+            ns.norms[:len(ids)] = norms
+            ns.ids = list(ids)
+            ns.rows = {vector_id: row for row, vector_id in enumerate(ids)}
+            for row, meta in enumerate(metadata):
+                for key, value in meta.items():
+                    ns._column(key)[row] = value
+
+# ---------------- FACTORY ----------------
+_store = None
+_store_lock = threading.Lock()
+
+def get_vector_store() -> VectorStore:
+    """Process-wide vector store selected by VECTOR_STORE ("pinecone" or "local")."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if VECTOR_STORE == "local":
+                _store = LocalVectorStore()
+                print(f"[INFO] Using local vector store ({LOCAL_VECTOR_STORE_PATH or 'in memory'})")
+            elif VECTOR_STORE == "pinecone":
+                _store = PineconeVectorStore()
+            else:
+                raise ValueError(f"Unknown VECTOR_STORE: {VECTOR_STORE}")
+        return _store
+
+# ---------------- PER-USER NAMESPACES ----------------
+def user_namespace(user_id: str) -> str:
+    """
+    Namespace holding a user's notes, quizzes, progress and chat history.
+
+    Queries then only scan that user's vectors. With USER_NAMESPACE_SHARDS
+    set, users are hashed into a fixed number of shared namespaces instead,
+    so callers keep filtering on user_id either way.
+    """
+    if USER_NAMESPACE_SHARDS > 0:
+        shard = int(hashlib.sha256(user_id.encode("utf-8")).hexdigest(), 16) % USER_NAMESPACE_SHARDS
+        return f"tenant-shard-{shard:04d}"
+    return f"tenant-{user_id}"
+
+def record_namespace(record: Dict[str, Any]) -> Optional[str]:
+    """User namespace of an upsert record, from its user_id metadata (None if it has none)."""
+    user_id = (record.get("metadata") or {}).get("user_id")
+    return user_namespace(user_id) if user_id else None
+
+def delete_user_vectors(store: VectorStore, user_id: str) -> int:
+    """
+    Remove every vector a user owns from their namespace.
+
+    A per-user namespace is dropped in one call (returns -1, the count is
+    unknown); in a shard the user's IDs, which all start with "<user_id>_",
+    are listed and deleted.
+    """
+    namespace = user_namespace(user_id)
+    if USER_NAMESPACE_SHARDS <= 0:
+        store.delete(delete_all=True, namespace=namespace)
+        return -1
+    # Collect first so deletes don't shift the pages being listed
+    ids = [vector_id for page in store.list(prefix=f"{user_id}_", namespace=namespace) for vector_id in page]
+    for i in range(0, len(ids), 100):
+        store.delete(ids=ids[i:i + 100], namespace=namespace)
+    return len(ids)
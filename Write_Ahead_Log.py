@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from Embeddings import backoff_delay
+from Write_Behind import WriteBehindQueue
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+WAL_PATH = os.getenv("WAL_PATH", os.path.join(".studybuddy", "pending_writes.jsonl"))
+WAL_FSYNC = os.getenv("WAL_FSYNC", "1") == "1"
+WAL_REPLAY_INTERVAL = float(os.getenv("WAL_REPLAY_INTERVAL", "10.0"))  # seconds
+WAL_COMPACT_AFTER = int(os.getenv("WAL_COMPACT_AFTER", "500"))  # acknowledged entries
+WAL_BACKOFF_BASE = float(os.getenv("WAL_BACKOFF_BASE", "10.0"))
+WAL_BACKOFF_MAX = float(os.getenv("WAL_BACKOFF_MAX", "600.0"))
+
+# ---------------- WRITE-AHEAD LOG ----------------
+class WriteAheadLog:
+    """
+    Append-only JSONL log of vector-store writes that have not been acknowledged.
+
+    Every write is appended (and fsynced) before it is sent, and an "ack" line
+    is appended once the store confirms it. Entries that fail, or that were
+    still pending when the process stopped, are retried by a background
+    replayer with exponential backoff per kind. The file is rewritten with
+    only the pending entries after WAL_COMPACT_AFTER acknowledgements.
+
+    One log file belongs to one process; run separate processes with
+    separate WAL_PATH values.
+    """
+
+    def __init__(self, path: str = WAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[str, Any]] = {}
+        self._inflight = set()
+        self._handlers: Dict[str, Callable[[List[Any]], None]] = {}
+        self._retry_state: Dict[str, Tuple[int, float]] = {}
+        self._seq = 0
+        self._acked_since_compact = 0
+        self._thread = None
+        self._file = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._load()
+            self._file = open(path, "a", encoding="utf-8")
+            if self._pending:
+                print(f"[INFO] Write-ahead log: {len(self._pending)} pending writes to replay")
+        except Exception as e:
+            # Writes still go out, they just aren't durable across failures
+            print(f"[WARNING] Write-ahead log disabled ({path}): {e}")
+            self._file = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-append
+                    continue
+                if entry.get("op") == "append":
+                    self._pending[entry["seq"]] = (entry["kind"], entry["payload"])
+                    self._seq = max(self._seq, entry["seq"])
+                elif entry.get("op") == "ack":
+                    for seq in entry.get("seqs", []):
+                        self._pending.pop(seq, None)
+
+    def _write_lines(self, entries: List[Dict[str, Any]]):
+        self._file.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries))
+        self._file.flush()
+        if WAL_FSYNC:
+            os.fsync(self._file.fileno())
+
+    def append(self, kind: str, payload: Any) -> Optional[int]:
+        """Durably record a pending write; returns its sequence number (None if the log is disabled)."""
+        if self._file is None:
+            return None
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            try:
+                self._write_lines([{"op": "append", "seq": seq, "kind": kind, "ts": time.time(), "payload": payload}])
+            except Exception as e:
+                print(f"[WARNING] Write-ahead log append failed: {e}")
+                return None
+            self._pending[seq] = (kind, payload)
+            self._inflight.add(seq)
+        return seq
+
+    def ack(self, seqs: List[Optional[int]]):
+        """Mark writes as stored; they are dropped at the next compaction."""
+        seqs = [s for s in seqs if s is not None]
+        if not seqs or self._file is None:
+            return
+        with self._lock:
+            try:
+                self._write_lines([{"op": "ack", "seqs": seqs}])
+            except Exception as e:
+                print(f"[WARNING] Write-ahead log ack failed: {e}")
+            for seq in seqs:
+                self._pending.pop(seq, None)
+                self._inflight.discard(seq)
+            self._acked_since_compact += len(seqs)
+            if self._acked_since_compact >= WAL_COMPACT_AFTER:
+                self._compact()
+
+    def release(self, seqs: List[Optional[int]]):
+        """Hand failed writes over to the replayer."""
+        with self._lock:
+            for seq in seqs:
+                self._inflight.discard(seq)
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as tmp:
+                for seq, (kind, payload) in sorted(self._pending.items()):
+                    tmp.write(json.dumps({"op": "append", "seq": seq, "kind": kind, "payload": payload},
+                                         separators=(",", ":")) + "\n")
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._acked_since_compact = 0
+        except Exception as e:
+            print(f"[WARNING] Write-ahead log compaction failed: {e}")
+        finally:
+            if self._file.closed:
+                self._file = open(self.path, "a", encoding="utf-8")
+
+    def register(self, kind: str, writer: Callable[[List[Any]], None]):
+        """Set the function that replays payloads of `kind`; it must raise on failure."""
+        with self._lock:
+            self._handlers[kind] = writer
+            if self._thread is None and self._file is not None:
+                self._thread = threading.Thread(target=self._replay_loop, name="wal-replay", daemon=True)
+                self._thread.start()
+
+    def replay_once(self) -> int:
+        """Retry pending writes whose backoff has expired; returns how many were stored."""
+        now = time.monotonic()
+        with self._lock:
+            by_kind: Dict[str, List[Tuple[int, Any]]] = {}
+            for seq, (kind, payload) in sorted(self._pending.items()):
+                if seq in self._inflight or kind not in self._handlers:
+                    continue
+                if self._retry_state.get(kind, (0, 0.0))[1] > now:
+                    continue
+                by_kind.setdefault(kind, []).append((seq, payload))
+            for entries in by_kind.values():
+                self._inflight.update(seq for seq, _ in entries)
+
+        stored = 0
+        for kind, entries in by_kind.items():
+            seqs = [seq for seq, _ in entries]
+            try:
+                self._handlers[kind]([payload for _, payload in entries])
+            except Exception as e:
+                attempt = self._retry_state.get(kind, (0, 0.0))[0]
+                delay = backoff_delay(attempt, WAL_BACKOFF_BASE, WAL_BACKOFF_MAX)
+                self._retry_state[kind] = (attempt + 1, time.monotonic() + delay)
+                print(f"[WARNING] Replay of {len(entries)} pending {kind} writes failed, retrying in {delay:.0f}s: {e}")
+                self.release(seqs)
+                continue
+            self._retry_state.pop(kind, None)
+            self.ack(seqs)
+            stored += len(seqs)
+            print(f"[INFO] Replayed {len(seqs)} pending {kind} writes")
+        return stored
+
+    def _replay_loop(self):
+        while True:
+            time.sleep(WAL_REPLAY_INTERVAL)
+            try:
+                self.replay_once()
+            except Exception as e:
+                print(f"[ERROR] Write-ahead log replay: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            for kind, _ in self._pending.values():
+                kinds[kind] = kinds.get(kind, 0) + 1
+            return {"pending": len(self._pending), "inflight": len(self._inflight), **kinds}
+
+wal = WriteAheadLog()
+
+# ---------------- DURABLE WRITE-BEHIND QUEUE ----------------
+class DurableQueue:
+    """
+    WriteBehindQueue whose records are logged to the WAL first.
+
+    put() returns as soon as the record is on disk, so the caller can report
+    success immediately; the batch writer runs in the background, and a
+    batch that fails stays in the log for the replayer.
+    """
+
+    def __init__(self, kind: str, writer: Callable[[List[Any]], None], **queue_options):
+        self.kind = kind
+        self.writer = writer
+        self._queue = WriteBehindQueue(kind, self._write, **queue_options)
+        wal.register(kind, writer)
+
+    def _write(self, entries: List[Tuple[Optional[int], Any]]):
+        seqs = [seq for seq, _ in entries]
+        try:
+            self.writer([payload for _, payload in entries])
+        except Exception:
+            wal.release(seqs)
+            raise
+        wal.ack(seqs)
+
+    def put(self, payload: Any) -> bool:
+        return self._queue.put((wal.append(self.kind, payload), payload))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self._queue.flush(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return self._queue.stats()
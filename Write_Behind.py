@@ -0,0 +1,149 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+# ---------------- LOAD ENV VARIABLES ----------------
+load_dotenv()
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "50"))
+WRITE_BEHIND_MAX_DELAY = float(os.getenv("WRITE_BEHIND_MAX_DELAY", "2.0"))  # seconds
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_DRAIN_TIMEOUT = float(os.getenv("WRITE_BEHIND_DRAIN_TIMEOUT", "15.0"))
+
+# ---------------- WRITE-BEHIND QUEUE ----------------
+_STOP = object()
+
+class WriteBehindQueue:
+    """
+    In-process write-behind buffer.
+
+    put() only enqueues, so callers never wait on the backing store. A
+    background thread collects records and hands them to `writer(records)`
+    in batches, flushing as soon as `max_batch` records are waiting or
+    `max_delay` seconds after the first record of a batch arrived. The
+    queue drains at interpreter exit; if it is full, put() falls back to
+    writing the record itself.
+    """
+
+    def __init__(self, name: str, writer: Callable[[List[Any]], None],
+                 max_batch: int = WRITE_BEHIND_MAX_BATCH, max_delay: float = WRITE_BEHIND_MAX_DELAY,
+                 max_pending: int = WRITE_BEHIND_MAX_PENDING):
+        self.name = name
+        self.writer = writer
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def put(self, record: Any) -> bool:
+        if self._closed:
+            self._write([record])
+            return True
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            print(f"[WARNING] {self.name} write-behind queue full, writing synchronously")
+            self._write([record])
+            return True
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything enqueued so far has been written (or `timeout` passes)."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = WRITE_BEHIND_DRAIN_TIMEOUT):
+        """Drain pending records and stop the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"[WARNING] {self.name} write-behind queue did not drain within {timeout}s")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "pending": self._queue.qsize()
+        }
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                # Daemon so a stuck backend can't hang shutdown; atexit drains it first
+                self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _write(self, batch: List[Any]):
+        try:
+            self.writer(batch)
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        except Exception as e:
+            print(f"[ERROR] {self.name} write-behind batch of {len(batch)} failed: {e}")
+            with self._lock:
+                self.failed += len(batch)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self._queue.get()
+            if record is _STOP:
+                self._queue.task_done()
+                break
+            batch = [record]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    record = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(record)
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+        # Records that raced in behind the stop marker
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        batch = [r for r in leftovers if r is not _STOP]
+        if batch:
+            self._write(batch)
+        for _ in leftovers:
+            self._queue.task_done()
@@ -6,9 +6,10 @@ import hashlib
 import json
 from datetime import datetime, timedelta  # Removed timezone import
 from dotenv import load_dotenv
-from pinecone import Pinecone
 import bcrypt
 import jwt
+from Embeddings import embed_text, to_pinecone
+from Vector_Store import get_vector_store
 
 load_dotenv()
 
@@ -16,8 +17,6 @@ load_dotenv()
 # CONFIGURATION
 # ============================================
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = os.getenv("INDEX_NAME", "studybuddy")
 # Use a strong key (at least 32 characters)
 JWT_SECRET = os.getenv("JWT_SECRET", "your-super-secret-key-at-least-32-characters-long")
 
@@ -54,22 +53,15 @@ if st.session_state.logged_in and st.session_state.token:
      st.stop()
    
 # ============================================
-# PINECONE SETUP
+# VECTOR STORE SETUP
 # ============================================
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+index = get_vector_store()
 
 # ============================================
 # AUTH FUNCTIONS (Pinecone Only)
 # ============================================
 
-def embed_text(text: str) -> list:
-    """Simple embedding function (use Gemini in production)"""
-    import random
-    random.seed(hash(text) % 2**32)
-    return [random.uniform(0.01, 0.02) for _ in range(768)]
-
 def find_user_by_email(email: str) -> dict:
     """Find user by email in Pinecone"""
     text = f"user_auth:{email}"
@@ -77,7 +69,7 @@ def find_user_by_email(email: str) -> dict:
     
     try:
         results = index.query(
-            vector=embedding,
+            vector=to_pinecone(embedding),
             top_k=1,
             include_metadata=True,
             namespace="users",
@@ -110,7 +102,7 @@ def create_user(email: str, password: str) -> dict:
     index.upsert(
         vectors=[{
             "id": f"{user_id}_auth",
-            "values": embedding,
+            "values": to_pinecone(embedding),
             "metadata": {
                 "user_id": user_id,
                 "type": "user_auth",
@@ -1,7 +1,6 @@
 # pages/app.py - Fixed duplicate saving
 import streamlit as st
 import os
-import tempfile
 import base64
 import time
 import streamlit.components.v1 as components
@@ -16,9 +15,11 @@ from Notes_Quiz_Section import (
     extract_text_from_txt,
     store_notes_and_quizzes
 )
+from Extraction_Cache import extract_texts_cached
+from Document_Manifest import document_manifest
+from Ingestion_Jobs import submit_ingestion_batch, get_job_status, cancel_job
 from Chatbot import (
     retrieve_context,
-    store_conversation,
     get_user_history,
     get_gemini_response,
     get_conversation_context,
@@ -26,9 +27,10 @@ from Chatbot import (
 from Progress import (
     store_progress,
     fetch_progress_from_pinecone,
-    cleanup_duplicate_progress,
+    load_progress_details,
     format_progress_for_display
 )
+from Hot_Tier import notes_hot_tier
 
 # -----------------------------
 # CHECK LOGIN STATUS
@@ -37,6 +39,9 @@ if not st.session_state.get('logged_in', False) or not st.session_state.get('use
     st.switch_page("app.py")
     st.stop()
 
+# Load this user's note vectors into memory in the background (no-op once loaded)
+notes_hot_tier.warm(st.session_state.user_id)
+
 # -----------------------------
 # LOAD CSS FROM EXTERNAL FILE
 # -----------------------------
@@ -143,7 +148,7 @@ defaults = {
     "custom_topic": "",
     "chat_input": "",
     "last_sent_message": "",
-    "uploaded_file": None,
+    "uploaded_files": None,
     "selected_options": {},
     "question_answered": {},
     "show_feedback": {},
@@ -161,6 +166,7 @@ defaults = {
     "last_user_message": None,
     "last_chat_messages": None,
     "_full_response": "",
+    "ingest_job_id": None,
 }
 
 for k, v in defaults.items():
@@ -168,23 +174,38 @@ for k, v in defaults.items():
         st.session_state[k] = v
 
 # -----------------------------
-# CONVERSATION SAVING WITH USER ID
+# Background Ingestion Status
 # -----------------------------
-
-def save_conversation_to_pinecone(user_id: str, question: str, answer: str, contexts: list = None):
-    """Save conversation with user_id for retrieval"""
-    try:
-        store_conversation(
-            user_id=user_id,
-            question=question,
-            answer=answer,
-            contexts=contexts or []
-        )
-        print(f"✅ Conversation saved for user: {user_id}")
-        return True
-    except Exception as e:
-        print(f"⚠️ Failed to save conversation: {e}")
-        return False
+@st.fragment(run_every=1.0)
+def render_ingestion_status():
+    """Poll the current uploads' ingestion job without rerunning the page"""
+    job_id = st.session_state.get("ingest_job_id")
+    job = get_job_status(job_id) if job_id else None
+    if not job:
+        return
+    
+    progress = job["progress"]
+    counts = (
+        f"📄 {progress['pages_parsed']} pages parsed · "
+        f"🧠 {progress['chunks_embedded']} chunks embedded · "
+        f"📦 {progress['vectors_upserted']} vectors saved"
+    )
+    if progress.get("chunks_unchanged"):
+        counts += f" · ♻️ {progress['chunks_unchanged']} unchanged"
+    if progress.get("files_total", 1) > 1:
+        counts = f"🗂️ {progress['files_done']}/{progress['files_total']} files · " + counts
+    
+    if job["status"] in ("queued", "running"):
+        st.markdown(show_custom_loader(f"Saving {job['document_name']} to your knowledge base..."), unsafe_allow_html=True)
+        st.caption(counts)
+        if st.button("✖ Cancel", key=f"cancel_ingest_{job_id}"):
+            cancel_job(job_id)
+    elif job["status"] == "completed":
+        st.info(f"📚 Notes saved to your knowledge base! ({counts}, {job['elapsed']}s)")
+    elif job["status"] == "cancelled":
+        st.warning(f"Upload cancelled. {counts}")
+    else:
+        st.warning(f"Note: Could not save to database: {job['error']}")
 
 # -----------------------------
 # Chat Helpers
@@ -235,18 +256,6 @@ def add_message_to_current_session(role, message):
 # -----------------------------
 # Interactive Quiz Helpers
 # -----------------------------
-def extract_text(file_path):
-    """Extract text from uploaded file based on extension"""
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".pdf":
-        return extract_text_from_pdf(file_path)
-    elif ext == ".docx":
-        return extract_text_from_docx(file_path)
-    elif ext == ".txt":
-        return extract_text_from_txt(file_path)
-    else:
-        raise ValueError(f"Unsupported file format: {ext}")
-
 def handle_option_click(question_idx, option_key):
     """Handle option click - direct selection without extra buttons"""
     if question_idx not in st.session_state.selected_options:
@@ -747,19 +756,10 @@ with tab1:
                             yield chunk_text
                             time.sleep(0.05)
                     
-                    # SAVE ONCE HERE - after streaming completes
+                    # after streaming completes; get_gemini_response already
+                    # queued the turn (with its contexts) for Pinecone
                     if full_response and user_question:
-                        # Add to session messages
                         add_message_to_current_session("bot", full_response)
-                        
-                        # Save to Pinecone with user_id (ONCE)
-                        save_conversation_to_pinecone(
-                            user_id=st.session_state.user_id,
-                            question=user_question,
-                            answer=full_response,
-                            contexts=[]
-                        )
-                        print(f"✅ Saved conversation for user: {st.session_state.user_id}")
                     
                     # Store full response for any cleanup
                     st.session_state._full_response = full_response
@@ -1287,35 +1287,41 @@ with tab2:
         if st.session_state.quiz_source == "Notes":
             st.info("📤 Upload your study notes (PDF, DOCX, or TXT)")
             
-            uploaded_file = st.file_uploader(
-                "Choose a file",
+            uploaded_files = st.file_uploader(
+                "Choose files",
                 type=["pdf", "docx", "txt"],
+                accept_multiple_files=True,
                 key="file_uploader",
                 label_visibility="collapsed"
             )
             
-            if uploaded_file is not None:
-                if uploaded_file != st.session_state.get("uploaded_file"):
+            if uploaded_files:
+                upload_names = ", ".join(f.name for f in uploaded_files)
+                upload_signature = [(f.name, f.size) for f in uploaded_files]
+                if upload_signature != st.session_state.get("uploaded_files"):
                     st.session_state.notes_text = ""
-                    st.session_state.uploaded_file = uploaded_file
+                    st.session_state.uploaded_files = upload_signature
                 
                 if not st.session_state.notes_text:
                     loader_placeholder = st.empty()
                     with loader_placeholder.container():
-                        st.markdown(show_custom_loader(f"Extracting text from {uploaded_file.name}..."), unsafe_allow_html=True)
-                    
-                    suffix = os.path.splitext(uploaded_file.name)[1].lower()
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                        tmp.write(uploaded_file.getvalue())
-                        temp_path = tmp.name
+                        st.markdown(show_custom_loader(f"Extracting text from {upload_names}..."), unsafe_allow_html=True)
                     
                     try:
-                        st.session_state.notes_text = extract_text(temp_path)
+                        # Parsed concurrently straight from the upload buffers, no
+                        # temp files; repeat uploads of the same bytes come from the cache
+                        extracted = extract_texts_cached([(f, f.name) for f in uploaded_files])
                         loader_placeholder.empty()
                         
+                        for f, (text, _, from_cache) in zip(uploaded_files, extracted):
+                            if text:
+                                cache_note = " (cached)" if from_cache else ""
+                                st.success(f"✅ Successfully extracted {len(text)} characters from {f.name}{cache_note}")
+                            else:
+                                st.warning(f"⚠️ No text found in {f.name}")
+                        st.session_state.notes_text = "\n\n".join(text for text, _, _ in extracted if text)
+                        
                         if st.session_state.notes_text:
-                            st.success(f"✅ Successfully extracted {len(st.session_state.notes_text)} characters from {uploaded_file.name}")
-                            
                             with st.expander("📄 Preview extracted notes", expanded=True):
                                 preview_text = st.session_state.notes_text[:1500]
                                 if len(st.session_state.notes_text) > 1500:
@@ -1328,26 +1334,33 @@ with tab2:
                                     label_visibility="collapsed"
                                 )
                             
-                            try:
-                                from Notes_Quiz_Section import store_notes_and_quizzes
-                                store_notes_and_quizzes(
-                                    user_id=st.session_state.user_id,
-                                    notes_text=st.session_state.notes_text
-                                )
-                                st.info("📚 Notes saved to your knowledge base!")
-                            except Exception as e:
-                                st.warning(f"Note: Could not save to database: {str(e)}")
+                            # The job reuses the text extracted above instead of
+                            # parsing the uploads a second time
+                            new_files = [
+                                (None, f.name, file_hash, text)
+                                for f, (text, file_hash, _) in zip(uploaded_files, extracted)
+                                if text and not document_manifest.find_source(st.session_state.user_id, file_hash)
+                            ]
+                            if not new_files:
+                                st.session_state.ingest_job_id = None
+                                st.info("📚 These notes are already in your knowledge base!")
+                            else:
+                                try:
+                                    # All new files go into one background job so their
+                                    # chunks share embed/upsert batches; the status panel
+                                    # below polls it
+                                    st.session_state.ingest_job_id = submit_ingestion_batch(
+                                        user_id=st.session_state.user_id,
+                                        files=new_files
+                                    )
+                                except Exception as e:
+                                    st.warning(f"Note: Could not save to database: {str(e)}")
                                 
                     except Exception as e:
                         loader_placeholder.empty()
                         st.error(f"❌ Error extracting text: {str(e)}")
-                    finally:
-                        try:
-                            os.remove(temp_path)
-                        except:
-                            pass
                 else:
-                    st.success(f"✅ Notes already extracted from {uploaded_file.name}")
+                    st.success(f"✅ Notes already extracted from {upload_names}")
                     
                     with st.expander("📄 View extracted notes", expanded=False):
                         preview_text = st.session_state.notes_text[:1500]
@@ -1361,6 +1374,8 @@ with tab2:
                             label_visibility="collapsed"
                         )
             
+                render_ingestion_status()
+            
             else:
                 st.markdown("""
                 <div style="text-align: center; padding: 40px; border: 2px dashed rgba(255,255,255,0.1); border-radius: 12px; margin: 20px 0;">
@@ -1580,7 +1595,8 @@ with tab3:
             
             st.subheader("📋 Attempt History")
             
-            for i, attempt in enumerate(progress_list[:10]):
+            # Per-question feedback is loaded locally, only for the rows shown
+            for i, attempt in enumerate(load_progress_details(progress_list[:10])):
                 accuracy = attempt.get('accuracy', 0)
                 score = attempt.get('score', 0)
                 total = attempt.get('total', 1)